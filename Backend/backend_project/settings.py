@@ -27,6 +27,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be high up
+    'myapp.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +84,34 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# ==================== PASSWORD HASHING SETTINGS ====================
+# PASSWORD_HASHER_PROFILE picks the hasher for new and upgraded hashes; the
+# others stay listed so existing hashes keep verifying. Parameters are the
+# OWASP minimums, cheaper per login than Django's defaults. Raising them
+# upgrades each user's hash on their next login; hashes stored with higher
+# costs, such as Django's 1,000,000 PBKDF2 iterations, are never downgraded
+# (see myapp/hashers.py).
+# Compare profiles with `manage.py benchmark login:pbkdf2 login:scrypt ...`.
+# 'argon2' needs the argon2-cffi package.
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'myapp.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'myapp.hashers.ScryptPasswordHasher',
+    'argon2': 'myapp.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'pbkdf2')
+PASSWORD_HASHER_PARAMS = {
+    'pbkdf2': {'iterations': 600_000},
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 5},  # 16 MiB
+    'argon2': {'time_cost': 2, 'memory_cost': 19 * 1024, 'parallelism': 1},  # 19 MiB
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]] + [
+    path for name, path in PASSWORD_HASHER_PROFILES.items() if name != PASSWORD_HASHER_PROFILE
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+# Upgrade outdated hashes after the login response instead of during it
+PASSWORD_REHASH_IN_BACKGROUND = True
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
@@ -126,6 +155,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
 
 # ==================== CSRF SETTINGS ====================
@@ -150,12 +180,138 @@ CSRF_COOKIE_HTTPONLY = False
 
 CORS_ALLOW_ALL_ORIGINS = True  # Only for local testing!
 # Session configuration
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Store sessions in database
+# SESSION_ENGINE depends on the cache; see CACHE SETTINGS
 SESSION_COOKIE_AGE = 1209600  # 2 weeks in seconds
 SESSION_SAVE_EVERY_REQUEST = False  # Only save when modified
 SESSION_COOKIE_NAME = 'sessionid'
 APPEND_SLASH = True
 
+# ==================== CACHE SETTINGS ====================
+# CACHE_URL (or REDIS_URL) picks the shared cache used for sessions, carts and
+# menus: redis://host:6379/0 in production, file:///tmp/clicktoeat-cache for a
+# cache shared by local processes. Unset means a per-process in-memory cache,
+# which only the menu uses (see below).
+# The database stays the source of truth: if the cache is unreachable, reads
+# fall back to the database and cache writes are skipped (see myapp/cache.py).
+CACHE_URL = os.environ.get('CACHE_URL') or os.environ.get('REDIS_URL', '')
+
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'OPTIONS': {
+                # Fail fast so an outage costs milliseconds, not a worker
+                'socket_connect_timeout': 0.25,
+                'socket_timeout': 0.25,
+            },
+        }
+    }
+elif CACHE_URL.startswith('file://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_URL[len('file://'):],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Sessions and carts are cached only in a cache every worker shares. In a
+# per-process cache a logout or cart write handled by one worker would leave
+# the others serving their old copies (for two weeks, in a session's case).
+SHARED_CACHE = CACHE_URL.startswith(('redis://', 'rediss://', 'file://'))
+if SHARED_CACHE:
+    SESSION_ENGINE = 'myapp.session_store'  # Cached in CACHES, stored in database
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+CART_CACHE_ENABLED = SHARED_CACHE
+# Seconds a session's cart payload stays cached after its last write
+CART_CACHE_TIMEOUT = 60 * 5
+
+# ==================== MENU CACHE SETTINGS ====================
+# Seconds a serialized menu payload stays cached. Menu writes bump a version
+# key that invalidates payloads at once in a shared cache; with the default
+# per-process cache this bounds how long other workers can serve an old menu.
+MENU_CACHE_TIMEOUT = 60
+
+# ==================== ORDER EVENTS SETTINGS ====================
+# Broker behind /api/orders/events/ (Server-Sent Events, ASGI only: run
+# `gunicorn backend_project.asgi:application -k uvicorn.workers.UvicornWorker`).
+# The in-process broker only reaches streams served by the same process.
+ORDER_EVENTS_BROKER = 'myapp.events.InProcessBroker'
+# Seconds between keepalive comments on an idle stream
+ORDER_EVENTS_KEEPALIVE = 15
+
+# ==================== PICKUP SLOT SETTINGS ====================
+# Length of a pickup slot in minutes. Per-partner limits live in the
+# PickupSlotCapacity table (Django admin); run `manage.py rebuild_pickup_slots`
+# after changing this.
+PICKUP_SLOT_MINUTES = 5
+
+# ==================== IDEMPOTENCY SETTINGS ====================
+# Seconds a stored create_order response can be replayed for a retried
+# Idempotency-Key (purge old rows with `manage.py purge_idempotency_keys`)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# ==================== RESPONSE ENCODING SETTINGS ====================
+# 'auto' uses orjson when installed, else the stdlib encoder; or a dotted
+# path to any dumps(data) -> bytes
+JSON_RENDERER = os.environ.get('JSON_RENDERER', 'auto')
+# Smaller bodies are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = 6
+# Brotli (when the brotli package is installed); 4 compresses better than
+# gzip -6 at about the same speed
+COMPRESSION_BROTLI_QUALITY = 4
+
+# ==================== LOGGING SETTINGS ====================
+# JSON lines on stderr, written from a background thread (myapp/log.py).
+# Step-by-step request details are DEBUG records and only show up when
+# DEBUG is on (or LOG_LEVEL=DEBUG). LOG_SAMPLE_RATES keeps a fraction of the
+# DEBUG/INFO records of chatty views; warnings and errors are never sampled.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1'))
+LOG_SAMPLE_RATES = {
+    'add_to_cart': 0.1,
+    'get_cart': 0.1,
+    'get_partner_menu_items': 0.1,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'view_sampling': {
+            '()': 'myapp.log.ViewSampleFilter',
+            'rates': LOG_SAMPLE_RATES,
+            'default': LOG_SAMPLE_RATE,
+        },
+    },
+    'handlers': {
+        'structured': {
+            'class': 'myapp.log.NonBlockingHandler',
+            'filters': ['view_sampling'],
+        },
+    },
+    'loggers': {
+        'myapp': {
+            'handlers': ['structured'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'django': {
+            'handlers': ['structured'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # ==================== REST FRAMEWORK SETTINGS ====================
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -1,18 +1,63 @@
 from django.contrib import admin
-from .models import MenuItem, Cart, CartItem, Order, OrderItem, Favorite
+from django.db.models import DecimalField, F, Sum
+from .models import MenuItem, Cart, CartItem, Order, OrderItem, Favorite, Food_Partners, PickupSlotCapacity, PickupSlotLoad
+from .menu_cache import bump_menu_version
+from .events import order_partners, publish_order_event
+from .rollups import record_order_created, record_order_edit
+from .slots import record_slot_edit
 
 admin.site.register(Favorite)
 
+
+class MenuCacheAdminMixin:
+    """Invalidate cached menu/partner payloads on every admin write"""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_menu_version()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_menu_version()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_menu_version()
+
 @admin.register(MenuItem)
-class MenuItemAdmin(admin.ModelAdmin):
+class MenuItemAdmin(MenuCacheAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'price', 'category', 'available']
     list_filter = ['category', 'available']
     search_fields = ['name', 'description']
 
+@admin.register(Food_Partners)
+class FoodPartnersAdmin(MenuCacheAdminMixin, admin.ModelAdmin):
+    list_display = ['store', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['store']
+
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['id', 'session_id', 'created_at', 'total_items', 'total_price']
 
+    def get_queryset(self, request):
+        # Totals for the whole changelist page in the same query
+        return super().get_queryset(request).annotate(
+            _total_items=Sum('items__quantity'),
+            _total_price=Sum(
+                F('items__quantity') * F('items__menu_item__price'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+    @admin.display(ordering='_total_items', description='Total items')
+    def total_items(self, obj):
+        return obj._total_items or 0
+
+    @admin.display(ordering='_total_price', description='Total price')
+    def total_price(self, obj):
+        return obj._total_price or 0
+
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ['cart', 'menu_item', 'quantity', 'subtotal']
@@ -24,6 +69,30 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['session_id']
     readonly_fields = ['created_at', 'updated_at']
 
+    def save_model(self, request, obj, form, change):
+        # Keep rollups, slot loads and event streams in step with the order,
+        # as the status views do (the admin runs this in a transaction)
+        if not change:
+            super().save_model(request, obj, form, change)
+            record_order_created(obj)
+            return
+        previous = Order.objects.select_for_update().get(pk=obj.pk)
+        super().save_model(request, obj, form, change)
+        record_order_edit(obj, previous)
+        record_slot_edit(obj, previous)
+        if previous.status != obj.status:
+            publish_order_event('order.status_changed', obj, order_partners(obj), previous.status)
+
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ['order', 'menu_item', 'quantity', 'price_at_purchase', 'subtotal']
\ No newline at end of file
+    list_display = ['order', 'item_name', 'food_partner', 'quantity', 'price_at_purchase', 'subtotal']
+
+@admin.register(PickupSlotCapacity)
+class PickupSlotCapacityAdmin(admin.ModelAdmin):
+    list_display = ['food_partner', 'max_orders', 'max_items']
+    search_fields = ['food_partner']
+
+@admin.register(PickupSlotLoad)
+class PickupSlotLoadAdmin(admin.ModelAdmin):
+    list_display = ['food_partner', 'pickup_date', 'slot', 'order_count', 'item_count']
+    list_filter = ['food_partner', 'pickup_date']
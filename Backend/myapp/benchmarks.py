@@ -0,0 +1,255 @@
+"""Request latency benchmarks for ``manage.py benchmark``
+
+Each target drives one view through the Django test client and returns
+``(wall, cpu)`` seconds per request. Everything runs inside a transaction
+that is rolled back afterwards, so a target can be pointed at a real
+database without leaving rows behind. A target may also append lines to
+its ``notes`` (e.g. payload sizes), which the command prints with its
+timings.
+"""
+import gzip
+import json
+import statistics
+import time
+import uuid
+from datetime import date, time as clock
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.test import Client, override_settings
+
+from django.contrib.auth.models import User
+
+from .hashers import hasher_available
+from .middleware import brotli, compress
+from .models import Cart, CartItem, MenuItem, Order, OrderItem, UserProfile
+from .renderers import orjson, orjson_dumps, stdlib_dumps
+from .serializers import order_queryset, serialize_order
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name, description, iterations=200, warmup=20):
+    """Register a ``target(client, iterations)`` under ``name``"""
+    def register(target):
+        target.description = description
+        target.iterations = iterations
+        target.warmup = warmup
+        target.notes = []
+        BENCHMARKS[name] = target
+        return target
+    return register
+
+
+class BenchmarkSkipped(Exception):
+    """Raised by a target that can't run here (e.g. a missing library)"""
+
+
+class _Rollback(Exception):
+    pass
+
+
+def run_benchmark(name, iterations=None, warmup=None):
+    """Run a registered target; returns ``(wall, cpu)`` for the timed iterations"""
+    target = BENCHMARKS[name]
+    iterations = target.iterations if iterations is None else iterations
+    warmup = target.warmup if warmup is None else warmup
+    client = Client(SERVER_NAME='localhost')
+    latencies = []
+    target.notes = []
+    try:
+        with transaction.atomic():
+            latencies = target(client, warmup + iterations)[warmup:]
+            raise _Rollback
+    except _Rollback:
+        pass
+    return latencies
+
+
+def summarize(latencies):
+    """Wall-clock mean and percentiles plus mean CPU time, in milliseconds"""
+    ms = sorted(wall * 1000 for wall, _ in latencies)
+    quantiles = statistics.quantiles(ms, n=100, method='inclusive') if len(ms) > 1 else ms * 99
+    return {
+        'requests': len(ms),
+        'cpu': statistics.fmean(cpu * 1000 for _, cpu in latencies),
+        'per_core': len(latencies) / sum(cpu for _, cpu in latencies),
+        'mean': statistics.fmean(ms),
+        'p50': quantiles[49],
+        'p95': quantiles[94],
+        'p99': quantiles[98],
+        'max': ms[-1],
+    }
+
+
+def _timed(send):
+    start, cpu_start = time.perf_counter(), time.process_time()
+    response = send()
+    elapsed = (time.perf_counter() - start, time.process_time() - cpu_start)
+    if response.status_code >= 400:
+        raise RuntimeError(f'Benchmark request failed ({response.status_code}): {response.content[:200]!r}')
+    return elapsed
+
+
+# ==================== TARGETS ====================
+
+@benchmark('create_order', 'POST /api/orders/create/ with a three-line cart')
+def bench_create_order(client, iterations):
+    menu_items = [
+        MenuItem.objects.create(name=f'Benchmark item {i}', price=Decimal('49.00') + i, food_partner='Benchmark')
+        for i in range(3)
+    ]
+    latencies = []
+    for _ in range(iterations):
+        session_id = f'bench-{uuid.uuid4().hex}'
+        cart = Cart.objects.create(session_id=session_id)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, menu_item=menu_item, quantity=2) for menu_item in menu_items
+        ])
+        latencies.append(_timed(lambda: client.post(
+            '/api/orders/create/',
+            {
+                'session_id': session_id,
+                'payment_method': 'cash',
+                'pickup_time': '2030-01-01T12:00',
+                'customer_name': 'Benchmark',
+            },
+            content_type='application/json',
+        )))
+    return latencies
+
+
+@benchmark('login', 'POST /api/auth/login/ for a burst of different students', iterations=30, warmup=3)
+def bench_login(client, iterations):
+    password = 'correct horse battery staple'
+    users = []
+    for i in range(10):
+        user = User(username=f'bench-{uuid.uuid4().hex[:12]}')
+        user.set_password(password)
+        users.append(user)
+    User.objects.bulk_create(users)
+    users = list(User.objects.filter(username__in=[user.username for user in users]))
+    UserProfile.objects.bulk_create([UserProfile(user=user, full_name='Benchmark') for user in users])
+
+    latencies = []
+    for i in range(iterations):
+        username = users[i % len(users)].username
+        latencies.append(_timed(lambda: client.post(
+            '/api/auth/login/',
+            {'username': username, 'password': password},
+            content_type='application/json',
+        )))
+    return latencies
+
+
+def _login_with_profile(profile):
+    path = settings.PASSWORD_HASHER_PROFILES[profile]
+
+    def target(client, iterations):
+        if not hasher_available(path):
+            raise BenchmarkSkipped(f'{path} is missing its library')
+        with override_settings(PASSWORD_HASHERS=[path]):
+            return bench_login(client, iterations)
+    return target
+
+
+for _profile in settings.PASSWORD_HASHER_PROFILES:
+    benchmark(
+        f'login:{_profile}', f'login with the {_profile} hasher profile', iterations=30, warmup=3
+    )(_login_with_profile(_profile))
+
+
+# ==================== RESPONSE ENCODING ====================
+
+ADMIN_ORDERS_URL = '/api/admin/orders/'
+
+
+def _seed_orders(count=200):
+    """``count`` three-line orders across three partners"""
+    menu_items = [
+        MenuItem.objects.create(name=f'Benchmark item {i}', price=Decimal('49.00') + i, food_partner=f'Benchmark {i}')
+        for i in range(3)
+    ]
+    orders = Order.objects.bulk_create([
+        Order(
+            session_id=f'bench-{uuid.uuid4().hex}', customer_name=f'Benchmark customer {i}',
+            total_amount=Decimal('300.00'), tip_amount=Decimal('5.00'), payment_method='cash',
+            pickup_date=date(2030, 1, 1), pickup_time=clock(12, i % 60),
+        )
+        for i in range(count)
+    ])
+    if orders[0].pk is None:
+        # Backends that don't return bulk-inserted ids
+        orders = list(Order.objects.filter(session_id__in=[order.session_id for order in orders]))
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order, menu_item=menu_item, quantity=2, price_at_purchase=menu_item.price,
+            food_partner=menu_item.food_partner, item_name=menu_item.name,
+        )
+        for order in orders for menu_item in menu_items
+    ])
+
+
+def _admin_orders(encoding):
+    def target(client, iterations):
+        if encoding == 'br' and brotli is None:
+            raise BenchmarkSkipped('the brotli package is not installed')
+        _seed_orders()
+        plain = client.get(ADMIN_ORDERS_URL).content
+        compact = client.get(ADMIN_ORDERS_URL, {'format': 'compact'}).content
+        sizes = [('raw', plain), ('compact', compact), ('gzip', compress(plain, 'gzip'))]
+        if brotli is not None:
+            sizes += [('br', compress(plain, 'br')), ('compact+br', compress(compact, 'br'))]
+        target.notes.append('bytes on the wire: ' + '  '.join(f'{name} {len(body)}' for name, body in sizes))
+        return [
+            _timed(lambda: client.get(ADMIN_ORDERS_URL, HTTP_ACCEPT_ENCODING=encoding))
+            for _ in range(iterations)
+        ]
+    return target
+
+
+for _encoding in ('identity', 'gzip', 'br'):
+    benchmark(
+        f'admin_orders:{_encoding}', f'GET {ADMIN_ORDERS_URL} (200 orders) with Accept-Encoding: {_encoding}',
+        iterations=50, warmup=5,
+    )(_admin_orders(_encoding))
+
+
+def _django_dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+RENDERERS = {
+    'django': _django_dumps,
+    'stdlib': stdlib_dumps,
+    'orjson': orjson_dumps,
+}
+
+
+def _render(name):
+    def target(client, iterations):
+        if name == 'orjson' and orjson is None:
+            raise BenchmarkSkipped('the orjson package is not installed')
+        _seed_orders()
+        # The admin orders payload as the view hands it to the renderer
+        payload = {'orders': [serialize_order(order) for order in order_queryset()]}
+        dumps = RENDERERS[name]
+        body = dumps(payload)
+        target.notes.append(f'{len(body)} bytes, {len(gzip.compress(body, mtime=0))} gzipped')
+        latencies = []
+        for _ in range(iterations):
+            start, cpu_start = time.perf_counter(), time.process_time()
+            dumps(payload)
+            latencies.append((time.perf_counter() - start, time.process_time() - cpu_start))
+        return latencies
+    return target
+
+
+for _renderer in RENDERERS:
+    benchmark(
+        f'render:{_renderer}', f'serialize the admin orders payload (200 orders) with the {_renderer} renderer',
+        iterations=200, warmup=10,
+    )(_render(_renderer))
@@ -0,0 +1,84 @@
+"""Cache access that degrades to the database when the cache is unreachable.
+
+The database stays the source of truth for sessions, carts and menus; the
+cache only saves reads. If the cache server is down or times out, every
+call here logs the error and behaves like a miss (reads return the
+default, writes are dropped), so requests fall back to the database
+instead of failing.
+"""
+import hashlib
+import logging
+
+from django.core.cache import caches
+
+
+logger = logging.getLogger(__name__)
+
+
+class FailSoftCache:
+    """Proxy over a configured cache alias that turns cache errors into misses"""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def _cache(self):
+        # caches[] is per-thread, so look it up on each use
+        return caches[self.alias]
+
+    def _call(self, method, *args, default=None, **kwargs):
+        try:
+            return getattr(self._cache, method)(*args, **kwargs)
+        except Exception:
+            logger.warning('Cache %s failed on %s; falling back to the database', self.alias, method, exc_info=True)
+            return default
+
+    async def _acall(self, method, *args, default=None, **kwargs):
+        try:
+            return await getattr(self._cache, method)(*args, **kwargs)
+        except Exception:
+            logger.warning('Cache %s failed on %s; falling back to the database', self.alias, method, exc_info=True)
+            return default
+
+    def get(self, key, default=None):
+        return self._call('get', key, default, default=default)
+
+    def set(self, key, value, timeout=None):
+        if self._call('set', key, value, timeout, default=False) is False:
+            # Don't leave an older copy behind to be served later
+            self._call('delete', key)
+
+    def add(self, key, value, timeout=None):
+        return self._call('add', key, value, timeout, default=False)
+
+    def delete(self, key):
+        self._call('delete', key)
+
+    def __contains__(self, key):
+        return self._call('has_key', key, default=False)
+
+    # Async twins, used by the cached_db session store's aload/asave/adelete
+
+    async def aget(self, key, default=None):
+        return await self._acall('aget', key, default, default=default)
+
+    async def aset(self, key, value, timeout=None):
+        if await self._acall('aset', key, value, timeout, default=False) is False:
+            await self._acall('adelete', key)
+
+    async def aadd(self, key, value, timeout=None):
+        return await self._acall('aadd', key, value, timeout, default=False)
+
+    async def adelete(self, key):
+        await self._acall('adelete', key)
+
+    async def ahas_key(self, key):
+        return await self._acall('ahas_key', key, default=False)
+
+
+cache = FailSoftCache()
+
+
+def hashed_key(prefix, value):
+    """Cache key for arbitrary user-supplied strings (spaces, length)"""
+    return f'{prefix}:{hashlib.md5(value.encode()).hexdigest()}'
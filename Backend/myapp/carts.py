@@ -0,0 +1,215 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import cache, hashed_key
+from .counters import UPSERT_VENDORS
+from .menu_cache import get_menu_version
+from .models import CartItem
+
+
+def _can_upsert():
+    # RETURNING needs SQLite 3.35+; Django's feature flag tracks the version
+    return connection.vendor in UPSERT_VENDORS and connection.features.can_return_rows_from_bulk_insert
+
+
+# ==================== CART WRITES ====================
+
+def add_quantity(cart_id, menu_item_id, quantity):
+    """Add ``quantity`` of a menu item to a cart; returns ``(cart_item_id, new_quantity)``
+
+    One ``INSERT ... ON CONFLICT (cart, menu_item) DO UPDATE`` statement,
+    so concurrent double-taps add up instead of overwriting each other or
+    creating duplicate lines.
+    """
+    if not _can_upsert():
+        return _add_quantity_fallback(cart_id, menu_item_id, quantity)
+
+    qn = connection.ops.quote_name
+    table = qn(CartItem._meta.db_table)
+    sql = (
+        f'INSERT INTO {table} ({qn("cart_id")}, {qn("menu_item_id")}, {qn("quantity")}, {qn("added_at")}) '
+        f'VALUES (%s, %s, %s, %s) '
+        f'ON CONFLICT ({qn("cart_id")}, {qn("menu_item_id")}) '
+        f'DO UPDATE SET {qn("quantity")} = {table}.{qn("quantity")} + EXCLUDED.{qn("quantity")} '
+        f'RETURNING {qn("id")}, {qn("quantity")}'
+    )
+    with connection.cursor() as cursor:
+        added_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        cursor.execute(sql, [cart_id, menu_item_id, quantity, added_at])
+        return cursor.fetchone()
+
+
+def _add_quantity_fallback(cart_id, menu_item_id, quantity):
+    """Atomic F() increment, inserting the line when it doesn't exist yet"""
+    lines = CartItem.objects.filter(cart_id=cart_id, menu_item_id=menu_item_id)
+    if not lines.update(quantity=F('quantity') + quantity):
+        try:
+            with transaction.atomic():
+                item = CartItem.objects.create(cart_id=cart_id, menu_item_id=menu_item_id, quantity=quantity)
+            return item.id, item.quantity
+        except IntegrityError:
+            # Lost the race to insert; the line exists now
+            lines.update(quantity=F('quantity') + quantity)
+    return lines.values_list('id', 'quantity').get()
+
+
+# ==================== BATCH OPERATIONS ====================
+
+MAX_BATCH_OPERATIONS = 100
+BATCH_OPS = ('add', 'set', 'remove')
+
+
+def parse_cart_operations(operations):
+    """Validate a batch payload into ``[{'op', 'menu_item_id', 'quantity'}]``"""
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('operations must be a non-empty list')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise ValueError(f'At most {MAX_BATCH_OPERATIONS} operations per batch')
+
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f'Operation {index}: expected an object')
+        op = operation.get('op')
+        menu_item_id = operation.get('menu_item_id')
+        quantity = operation.get('quantity', 1 if op == 'add' else None)
+        if op not in BATCH_OPS:
+            raise ValueError(f'Operation {index}: op must be one of {", ".join(BATCH_OPS)}')
+        if not isinstance(menu_item_id, int):
+            raise ValueError(f'Operation {index}: menu_item_id required')
+        if op == 'add' and (not isinstance(quantity, int) or quantity < 1):
+            raise ValueError(f'Operation {index}: quantity must be a positive integer')
+        if op == 'set' and (not isinstance(quantity, int) or quantity < 0):
+            raise ValueError(f'Operation {index}: quantity must be a non-negative integer')
+        parsed.append({'op': op, 'menu_item_id': menu_item_id, 'quantity': quantity})
+    return parsed
+
+
+def apply_cart_operations(cart, operations):
+    """Apply parsed operations to a (locked) cart with at most four statements
+
+    Operations are folded in order over the current lines in memory, then
+    written as one read, one bulk insert, one bulk update and one delete.
+    ``set`` to 0 removes the line.
+    """
+    lines = {item.menu_item_id: item for item in CartItem.objects.filter(cart=cart)}
+    quantities = {menu_item_id: item.quantity for menu_item_id, item in lines.items()}
+
+    for operation in operations:
+        menu_item_id = operation['menu_item_id']
+        if operation['op'] == 'add':
+            quantities[menu_item_id] = quantities.get(menu_item_id, 0) + operation['quantity']
+        elif operation['op'] == 'set':
+            quantities[menu_item_id] = operation['quantity']
+        else:
+            quantities[menu_item_id] = 0
+
+    to_create, to_update, to_delete = [], [], []
+    for menu_item_id, quantity in quantities.items():
+        item = lines.get(menu_item_id)
+        if item is None:
+            if quantity > 0:
+                to_create.append(CartItem(cart=cart, menu_item_id=menu_item_id, quantity=quantity))
+        elif quantity <= 0:
+            to_delete.append(item.id)
+        elif quantity != item.quantity:
+            item.quantity = quantity
+            to_update.append(item)
+
+    if to_create:
+        CartItem.objects.bulk_create(to_create)
+    if to_update:
+        CartItem.objects.bulk_update(to_update, ['quantity'])
+    if to_delete:
+        CartItem.objects.filter(id__in=to_delete).delete()
+
+
+# ==================== CART PAYLOAD ====================
+
+def cart_payload(cart):
+    """The ``get_cart`` response body for ``cart``, from one query"""
+    cart_items = CartItem.objects.filter(cart=cart).select_related('menu_item')
+
+    items_data = []
+    total = Decimal('0.00')
+    item_count = 0
+    for item in cart_items:
+        # The lines are already loaded, so total them here
+        total += item.subtotal
+        item_count += item.quantity
+        items_data.append({
+            'id': item.id,
+            'menu_item_id': item.menu_item.id,
+            'name': item.menu_item.name,
+            'description': item.menu_item.description,
+            'price': str(item.menu_item.price),
+            'image_url': item.menu_item.image_url,
+            'category': item.menu_item.category,
+            'quantity': item.quantity,
+            'subtotal': str(item.subtotal)
+        })
+
+    return {
+        'cart': items_data,
+        'total': str(total),
+        'item_count': item_count
+    }
+
+
+# ==================== CART CACHE ====================
+
+def empty_cart_payload():
+    return {'cart': [], 'total': '0.00', 'item_count': 0}
+
+
+def _cart_cache_key(session_id):
+    # Payloads copy menu names and prices, and menu deletes remove cart
+    # lines; every menu write bumps the version, orphaning them all
+    token, _ = get_menu_version()
+    return hashed_key(f'cart:{token}', session_id)
+
+
+def get_cached_cart(session_id):
+    """Cached ``get_cart`` payload for a session, or ``None`` on a miss"""
+    if not settings.CART_CACHE_ENABLED:
+        return None
+    return cache.get(_cart_cache_key(session_id))
+
+
+def store_cart(session_id, payload):
+    """Cache a payload just read from the database after a cache miss
+
+    ``add`` never replaces a copy another reader has filled in meanwhile.
+    Writers don't call this; they drop the key with ``forget_cart``.
+    """
+    if session_id and settings.CART_CACHE_ENABLED:
+        cache.add(_cart_cache_key(session_id), payload, settings.CART_CACHE_TIMEOUT)
+    return payload
+
+
+def forget_cart(session_id):
+    """Drop a session's cached cart after a committed write"""
+    if session_id and settings.CART_CACHE_ENABLED:
+        cache.delete(_cart_cache_key(session_id))
+
+
+def refresh_cart(cart):
+    """Rebuild ``cart``'s payload after a committed write
+
+    The cached copy is deleted rather than overwritten: two writers setting
+    their own payloads could finish in either order and leave the older
+    one cached. The next ``get_cart`` fills the key from the database.
+    """
+    forget_cart(cart.session_id)
+    return cart_payload(cart)
+
+
+def refresh_cart_totals(cart):
+    """``cart.summary()`` after a committed write, for responses that only need totals"""
+    forget_cart(cart.session_id)
+    return cart.summary()
+
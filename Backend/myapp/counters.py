@@ -0,0 +1,60 @@
+"""Counter rows kept in step with Order writes
+
+Sales rollups and pickup-slot loads keep one row per key and add deltas
+to it. On PostgreSQL and SQLite all the rows one write touches go in a
+single ``INSERT ... ON CONFLICT DO UPDATE``, so an order costs the same
+number of statements whatever the number of partners in it. Other
+backends update row by row with F() and create the rows that are missing.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+
+# Backends whose INSERT ... ON CONFLICT DO UPDATE syntax we rely on
+UPSERT_VENDORS = ('postgresql', 'sqlite')
+
+
+def add_counts(model, key_fields, rows):
+    """Add each row's counts to the ``model`` row with its key, creating missing rows
+
+    ``rows`` are dicts of the ``key_fields`` plus the counts to add, with
+    distinct keys. Pass them in a fixed order (e.g. sorted by key) so
+    concurrent writers lock the rows in the same sequence.
+    """
+    if not rows:
+        return
+    if connection.vendor not in UPSERT_VENDORS:
+        for row in rows:
+            _add_counts_fallback(model, key_fields, row)
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    columns = [qn(field.column) for field in fields]
+    values = ', '.join(['(' + ', '.join(['%s'] * len(fields)) + ')'] * len(rows))
+    conflict = ', '.join(qn(model._meta.get_field(name).column) for name in key_fields)
+    updates = ', '.join(
+        f'{column} = {table}.{column} + EXCLUDED.{column}'
+        for field, column in zip(fields, columns) if field.name not in key_fields
+    )
+    sql = (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES {values} '
+        f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}'
+    )
+    params = [field.get_db_prep_save(row[field.name], connection) for row in rows for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _add_counts_fallback(model, key_fields, row):
+    key = {name: row[name] for name in key_fields}
+    deltas = {name: F(name) + value for name, value in row.items() if name not in key_fields}
+    if model.objects.filter(**key).update(**deltas):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**row)
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**key).update(**deltas)
@@ -0,0 +1,189 @@
+"""Order events pushed to browsers over Server-Sent Events
+
+Order views publish ``order.created`` and ``order.status_changed`` once
+their transaction commits, and ``order_events`` streams them to each
+subscriber that asked for that partner or session (or, for admins, to
+everyone). Events carry the order's session id so session streams can be
+matched, but it is the customer's only credential, so it is stripped
+before an event is written to any stream. The stream needs the ASGI entry
+point (``backend_project.asgi``).
+
+The broker comes from ``settings.ORDER_EVENTS_BROKER``. The default
+``InProcessBroker`` fans events out within one process, so serve the
+stream from a single ASGI worker process, or plug in a broker shared
+between processes: any class with a thread-safe ``publish(event)`` and a
+``subscribe()`` returning an async context manager whose value has an
+``async get()``.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OrderItem, UserProfile
+
+
+logger = logging.getLogger(__name__)
+
+# Sent instead of events a slow client missed; it should refetch
+RESYNC = {'type': 'resync'}
+
+# Used for matching only, never sent to subscribers
+PRIVATE_FIELDS = ('session_id',)
+
+# An event rather than an SSE comment, which browsers don't surface: clients
+# treat a stream that has gone quiet for longer than this as down and poll.
+# One is also sent on connect, once the subscription is live.
+KEEPALIVE = 'event: keepalive\ndata: {}\n\n'
+
+
+# ==================== BROKER ====================
+
+class _Subscription:
+    # A plain async context manager rather than an @asynccontextmanager
+    # generator: streams abandoned at shutdown are finalized in any order,
+    # and a nested generator may already be closed by then
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.overflowed = False
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(self.broker.max_pending)
+        with self.broker._lock:
+            self.broker._subscriptions.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        with self.broker._lock:
+            self.broker._subscriptions.discard(self)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self):
+        if self.overflowed:
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return RESYNC
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """Fans events out to the subscribers of this process"""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        # Sync views run on worker threads; hand the event to each
+        # subscriber's event loop
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # Its loop has closed; the stream is going away
+                pass
+
+    def subscribe(self):
+        return _Subscription(self)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.ORDER_EVENTS_BROKER)()
+    return _broker
+
+
+# ==================== PUBLISHING ====================
+
+def order_partners(order, items=None):
+    """Food partners with lines in ``order``; pass loaded items to skip the query"""
+    if items is not None:
+        return sorted({item.food_partner for item in items if item.food_partner})
+    return sorted(
+        OrderItem.objects.filter(order=order).exclude(food_partner='')
+        .values_list('food_partner', flat=True).distinct()
+    )
+
+
+def publish_order_event(event_type, order, partners, old_status=None):
+    """Publish an order event once the current transaction commits"""
+    event = {
+        'type': event_type,
+        'order_id': order.id,
+        'status': order.status,
+        'session_id': order.session_id,
+        'partners': partners,
+        'at': timezone.now().isoformat(),
+    }
+    if old_status is not None:
+        event['old_status'] = old_status
+
+    def publish():
+        try:
+            get_broker().publish(event)
+        except Exception:
+            logger.exception('Publishing order event failed', extra={'order_id': order.id})
+
+    transaction.on_commit(publish)
+
+
+# ==================== STREAMING ====================
+
+def event_filter(partner=None, session_id=None):
+    """Predicate selecting the events a subscriber asked for"""
+    def matches(event):
+        if event['type'] == RESYNC['type']:
+            return True
+        if partner and partner not in event['partners']:
+            return False
+        if session_id and event.get('session_id') != session_id:
+            return False
+        return True
+    return matches
+
+
+async def can_stream_all(user):
+    """Whether ``user`` may subscribe to every order's events (admins only)"""
+    if not user.is_authenticated:
+        return False
+    if user.is_staff or user.is_superuser:
+        return True
+    return await UserProfile.objects.filter(user=user, role='admin').aexists()
+
+
+async def stream_events(matches, keepalive=None):
+    """Yield ``text/event-stream`` chunks for matching events until disconnect"""
+    keepalive = keepalive or settings.ORDER_EVENTS_KEEPALIVE
+    yield 'retry: 3000\n\n'
+    async with get_broker().subscribe() as subscription:
+        yield KEEPALIVE
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), keepalive)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield KEEPALIVE
+                continue
+            if matches(event):
+                public = {key: value for key, value in event.items() if key not in PRIVATE_FIELDS}
+                yield f'event: {event["type"]}\ndata: {json.dumps(public)}\n\n'
@@ -0,0 +1,140 @@
+"""Password hashers tuned from ``settings.PASSWORD_HASHER_PARAMS``
+
+The classes keep Django's algorithm names, so stored hashes stay readable
+by either implementation. A hash made with cheaper parameters is reported
+as outdated and upgraded on the user's next successful login; one made
+with costlier parameters (e.g. Django's own defaults) is left alone.
+``verify_password`` does that upgrade on a background thread instead of
+inside the login request.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+
+def _param(profile, name, default):
+    return settings.PASSWORD_HASHER_PARAMS.get(profile, {}).get(name, default)
+
+
+class _UpgradeOnly:
+    """``must_update`` that never trades a stored hash for a cheaper one
+
+    Django rehashes whenever a cost parameter differs from the configured
+    one, which would rewrite stronger hashes with the cheaper OWASP
+    settings on every login.
+    """
+    cost_params = ()
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        if hashers.must_update_salt(decoded['salt'], self.salt_entropy):
+            return True
+        return any(decoded[name] < getattr(self, name) for name in self.cost_params)
+
+
+class PBKDF2PasswordHasher(_UpgradeOnly, hashers.PBKDF2PasswordHasher):
+    cost_params = ('iterations',)
+
+    @property
+    def iterations(self):
+        return _param('pbkdf2', 'iterations', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class ScryptPasswordHasher(_UpgradeOnly, hashers.ScryptPasswordHasher):
+    cost_params = ('work_factor', 'block_size', 'parallelism')
+
+    @property
+    def work_factor(self):
+        return _param('scrypt', 'work_factor', hashers.ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return _param('scrypt', 'block_size', hashers.ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return _param('scrypt', 'parallelism', hashers.ScryptPasswordHasher.parallelism)
+
+
+class Argon2PasswordHasher(_UpgradeOnly, hashers.Argon2PasswordHasher):
+    """Needs the optional ``argon2-cffi`` package"""
+
+    cost_params = ('time_cost', 'memory_cost', 'parallelism')
+
+    def must_update(self, encoded):
+        # A different variant or version is a change of algorithm, not cost
+        current, wanted = self.decode(encoded)['params'], self.params()
+        if (current.type, current.version) != (wanted.type, wanted.version):
+            return True
+        return super().must_update(encoded)
+
+    @property
+    def time_cost(self):
+        return _param('argon2', 'time_cost', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return _param('argon2', 'memory_cost', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return _param('argon2', 'parallelism', hashers.Argon2PasswordHasher.parallelism)
+
+
+def hasher_available(path):
+    """False when a hasher's optional library isn't installed"""
+    try:
+        hasher = import_string(path)()
+        if hasher.library:
+            hasher._load_library()
+    except (ImportError, ValueError):
+        return False
+    return True
+
+
+# ==================== REHASH ON LOGIN ====================
+
+# One worker: upgrades are rare after a rollout and shouldn't compete with
+# logins for every core
+_rehash_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rehash')
+
+
+def verify_password(user, raw_password):
+    """``user.check_password()`` that upgrades an outdated hash after commit
+
+    The new hash is computed and saved on a background thread once the
+    request's transaction commits, so the login response doesn't pay for a
+    second hash. With ``PASSWORD_REHASH_IN_BACKGROUND`` off this is plain
+    ``check_password`` (which upgrades synchronously).
+    """
+    if not settings.PASSWORD_REHASH_IN_BACKGROUND:
+        return user.check_password(raw_password)
+
+    old_encoded = user.password
+
+    def schedule_rehash(raw):
+        transaction.on_commit(
+            lambda: _rehash_pool.submit(_rehash, user.pk, old_encoded, raw)
+        )
+
+    return hashers.check_password(raw_password, old_encoded, schedule_rehash)
+
+
+def _rehash(user_id, old_encoded, raw_password):
+    try:
+        # Only replace the hash we verified, never a password changed since
+        User.objects.filter(pk=user_id, password=old_encoded).update(
+            password=hashers.make_password(raw_password)
+        )
+    except Exception:
+        logger.exception('Password rehash failed', extra={'user_id': user_id})
+    finally:
+        connections.close_all()
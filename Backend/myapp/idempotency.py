@@ -0,0 +1,62 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+# ==================== IDEMPOTENT REPLAYS ====================
+
+def request_fingerprint(request):
+    """Hash of what the client sent, so a reused key with a new body is caught"""
+    return hashlib.sha256(request.method.encode() + request.path.encode() + request.body).hexdigest()
+
+
+def find_replay(key, fingerprint):
+    """Stored response for ``key``, a 422 for a mismatched body, or ``None``
+
+    Call this while holding the lock that serializes the operation (the
+    cart row for orders), so a concurrent retry sees the first request's
+    committed record instead of racing it.
+    """
+    stored = IdempotencyKey.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+    if stored is None:
+        return None
+    if stored.fingerprint != fingerprint:
+        logger.warning('Idempotency-Key reused for a different request', extra={'idempotency_key': key})
+        return HttpResponse(
+            b'{"error": "Idempotency-Key was already used for a different request"}',
+            status=422,
+            content_type='application/json',
+        )
+    logger.info('Replaying stored response', extra={'idempotency_key': key})
+    response = HttpResponse(stored.response_body, status=stored.status_code, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def remember_response(key, fingerprint, response):
+    """Store ``response`` for replays until ``IDEMPOTENCY_KEY_TTL`` runs out"""
+    IdempotencyKey.objects.update_or_create(
+        key=key,
+        defaults={
+            'fingerprint': fingerprint,
+            'status_code': response.status_code,
+            'response_body': response.content.decode(),
+            'expires_at': timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+        },
+    )
+
+
+def purge_expired_keys():
+    """Delete expired records; returns how many were removed"""
+    return IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()[0]
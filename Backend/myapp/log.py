@@ -0,0 +1,115 @@
+"""Structured, non-blocking logging used by ``settings.LOGGING``
+
+Views log through ``logging.getLogger(__name__)``. Records go onto an
+in-memory queue and a background thread formats them as one JSON object
+per line and writes them out, so a slow stdout never stalls a request.
+Debug records are sampled per view; warnings and errors are always kept.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any ``extra={...}`` fields included"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'view': getattr(record, 'view', record.funcName),
+            'message': record.getMessage(),
+        }
+        entry.update(
+            (key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingHandler(QueueHandler):
+    """Queue records and write them from a listener thread
+
+    The request thread only interpolates the message and enqueues it; the
+    formatter and the stream write run on the listener thread. The listener
+    starts on the first record in each process: a thread started before a
+    fork (e.g. gunicorn ``--preload``) doesn't exist in the workers.
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(JsonFormatter())
+        self.listener = None
+        self._pid = None
+        atexit.register(self._stop_listener)
+
+    def _start_listener(self):
+        # Runs under the handler lock (Handler.handle), which logging
+        # re-creates in a forked child
+        if self._pid is not None:
+            # Forked: records left on the parent's queue are the parent's
+            self.queue = queue.SimpleQueue()
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def _stop_listener(self):
+        # Flush and join this process's listener, if it ever started
+        if self._pid == os.getpid():
+            self.listener.stop()
+            self._pid = None
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start_listener()
+        super().enqueue(record)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread, not in prepare()
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Render the traceback now rather than keep its frames alive
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class ViewSampleFilter(logging.Filter):
+    """Keep a fraction of DEBUG/INFO records per view; always keep WARNING+
+
+    ``rates`` maps a view name to the fraction of its records to keep; views
+    not listed use ``default``. The view is the logging function's name
+    unless the record passes ``extra={'view': ...}``.
+    """
+
+    def __init__(self, rates=None, default=1.0):
+        super().__init__()
+        self.rates = rates or {}
+        self.default = default
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'view', record.funcName), self.default)
+        return rate >= 1 or random.random() < rate
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.benchmarks import BENCHMARKS, BenchmarkSkipped, run_benchmark, summarize
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request latency of a view (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help=f'Targets to run (default: all of {", ".join(BENCHMARKS)})')
+        parser.add_argument('-n', '--iterations', type=int, help="Timed requests (default: the target's own)")
+        parser.add_argument('--warmup', type=int)
+
+    def handle(self, *args, **options):
+        targets = options['targets'] or list(BENCHMARKS)
+        unknown = [name for name in targets if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f'Unknown benchmark target(s): {", ".join(unknown)}')
+
+        for name in targets:
+            try:
+                stats = summarize(run_benchmark(name, options['iterations'], options['warmup']))
+            except BenchmarkSkipped as e:
+                self.stdout.write(self.style.WARNING(f'{name}: skipped ({e})'))
+                continue
+            self.stdout.write(
+                f'{name}: {stats["requests"]} requests  cpu {stats["cpu"]:.2f} ms/req '
+                f'({stats["per_core"]:.1f}/s/core)  mean {stats["mean"]:.2f} ms  '
+                f'p50 {stats["p50"]:.2f}  p95 {stats["p95"]:.2f}  p99 {stats["p99"]:.2f}  max {stats["max"]:.2f}'
+            )
+            for note in BENCHMARKS[name].notes:
+                self.stdout.write(f'  {note}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from myapp.menu_sync import MENU_FORMATS, export_menu, format_for
+
+
+class Command(BaseCommand):
+    help = 'Write the menu as a CSV/JSON file that import_menu can load again'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file (default: stdout)")
+        parser.add_argument('--format', choices=MENU_FORMATS, help='Default: from the file extension, else csv')
+        parser.add_argument('--partner', help="Only export this food partner's items")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        chunks = export_menu(options['format'] or format_for(path), options['partner'])
+        if path == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as output:
+            output.writelines(chunks)
@@ -0,0 +1,45 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.menu_sync import MENU_FORMATS, format_for, import_menu, read_menu_rows, text_stream
+
+
+class Command(BaseCommand):
+    help = 'Create or update menu items from a CSV/JSON menu file, writing only what changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Menu file (.csv, .json or a fixture like data.json); '-' for stdin")
+        parser.add_argument('--format', choices=MENU_FORMATS, help='Default: from the file extension')
+        parser.add_argument('--partner', help="Only import (and prune) this food partner's items")
+        parser.add_argument('--prune', action='store_true', help='Mark items missing from the file unavailable')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or format_for(path)
+        try:
+            if path == '-':
+                binary = io.BytesIO(sys.stdin.buffer.read())
+            else:
+                binary = open(path, 'rb')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with binary:
+            try:
+                summary = import_menu(
+                    read_menu_rows(text_stream(binary), fmt),
+                    food_partner=options['partner'],
+                    prune=options['prune'],
+                    dry_run=options['dry_run'],
+                )
+            except (ValueError, UnicodeError) as e:
+                raise CommandError(str(e))
+
+        prefix = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: {summary["created"]} created, {summary["updated"]} updated, '
+            f'{summary["unchanged"]} unchanged, {summary["disabled"]} disabled'
+        ))
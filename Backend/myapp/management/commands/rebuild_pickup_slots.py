@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from myapp.slots import rebuild_slot_loads
+
+
+class Command(BaseCommand):
+    help = 'Recount PickupSlotLoad rows for orders picked up from today on'
+
+    def handle(self, *args, **options):
+        count = rebuild_slot_loads()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} pickup slot load rows'))
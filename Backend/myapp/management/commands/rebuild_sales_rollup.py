@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from myapp.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailySalesRollup table from all orders'
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily sales rollup rows'))
@@ -0,0 +1,65 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import cache, hashed_key
+from .renderers import dumps
+
+
+MENU_VERSION_KEY = 'menu:version'
+
+
+# ==================== MENU VERSION ====================
+
+def get_menu_version():
+    """Current ``(token, timestamp)`` menu version, created on first use"""
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        cache.add(MENU_VERSION_KEY, _new_version(), None)
+        version = cache.get(MENU_VERSION_KEY) or _new_version()
+    return version
+
+
+def bump_menu_version():
+    """Invalidate every cached menu payload; call after any menu write"""
+    cache.set(MENU_VERSION_KEY, _new_version(), None)
+
+
+def _new_version():
+    now = time.time_ns()
+    return (f'{now:x}', now // 10**9)
+
+
+# ==================== CACHED RESPONSES ====================
+
+def cached_menu_response(request, name, build):
+    """Serve a menu payload from cache with a strong ETag and Last-Modified
+
+    ``build`` returns the JSON-serializable payload and only runs on a
+    cache miss. The serialized bytes are cached under the current menu
+    version, so a version bump orphans them all at once. The ETag is a
+    hash of those bytes, which keeps it correct even when another worker
+    holds an older copy until ``MENU_CACHE_TIMEOUT`` expires.
+    """
+    token, modified = get_menu_version()
+    key = hashed_key(f'menu:{token}', name)
+
+    entry = cache.get(key)
+    if entry is None:
+        body = dumps(build())
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        entry = (etag, body)
+        cache.set(key, entry, settings.MENU_CACHE_TIMEOUT)
+    etag, body = entry
+
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified)
+    response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response
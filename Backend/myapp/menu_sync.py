@@ -0,0 +1,230 @@
+"""Bulk menu import and export
+
+A menu file is CSV (one row per item, headed by ``MENU_FIELDS``), a JSON
+array of item objects, or a Django fixture such as ``data.json`` (only
+its ``myapp.menuitem`` entries are read). Items are matched to
+``MenuItem`` rows by ``(food_partner, name)``; an import writes only
+what differs, in one transaction, and bumps the menu cache version once.
+"""
+import codecs
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import URLValidator
+from django.db import transaction
+
+from .menu_cache import bump_menu_version
+from .models import MenuItem
+
+
+MENU_FIELDS = ('food_partner', 'name', 'description', 'price', 'image_url', 'category', 'available')
+UPDATABLE_FIELDS = ('description', 'price', 'image_url', 'category', 'available')
+MENU_FORMATS = ('csv', 'json')
+BATCH_SIZE = 500
+
+_TRUE = {'1', 'true', 'yes', 'y'}
+_FALSE = {'0', 'false', 'no', 'n'}
+
+
+# ==================== READING ====================
+
+def text_stream(binary):
+    """Decode a seekable binary menu file, honouring a UTF-8/16 BOM
+
+    ``manage.py dumpdata`` on Windows writes UTF-16, as ``data.json`` is.
+    """
+    head = binary.read(2)
+    binary.seek(0)
+    encoding = 'utf-16' if head in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) else 'utf-8-sig'
+    return codecs.getreader(encoding)(binary)
+
+
+def format_for(filename, default='csv'):
+    """``csv`` or ``json`` from a file name's extension"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in MENU_FORMATS else default
+
+
+def read_menu_rows(stream, fmt):
+    """Yield the raw item dicts of a text menu file; CSV is read a row at a time"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    data = json.load(stream)
+    if isinstance(data, dict):
+        data = data.get('items', [])
+    if not isinstance(data, list):
+        raise ValueError('JSON menu must be a list of items')
+    for entry in data:
+        if isinstance(entry, dict) and 'model' in entry:
+            # Django fixture entry
+            if entry['model'] == 'myapp.menuitem':
+                yield entry.get('fields', {})
+        else:
+            yield entry
+
+
+def clean_row(row, number):
+    """Validate one raw item into ``MenuItem`` field values"""
+    if not isinstance(row, dict):
+        raise ValueError(f'Row {number}: expected an object')
+
+    def text(field):
+        value = row.get(field)
+        return '' if value is None else str(value).strip()
+
+    name = text('name')
+    if not name:
+        raise ValueError(f'Row {number}: name is required')
+    try:
+        price = Decimal(text('price'))
+    except InvalidOperation:
+        raise ValueError(f'Row {number}: invalid price {row.get("price")!r}')
+    if not price.is_finite() or price < 0:
+        raise ValueError(f'Row {number}: invalid price {row.get("price")!r}')
+
+    image_url = text('image_url')
+    if image_url:
+        try:
+            URLValidator()(image_url)
+        except ValidationError:
+            raise ValueError(f'Row {number}: invalid image_url')
+
+    available = row.get('available', True)
+    if not isinstance(available, bool):
+        flag = str(available).strip().lower()
+        if flag in _TRUE or flag == '':
+            available = True
+        elif flag in _FALSE:
+            available = False
+        else:
+            raise ValueError(f'Row {number}: invalid available {row.get("available")!r}')
+
+    return {
+        'food_partner': text('food_partner'),
+        'name': name,
+        'description': text('description'),
+        'price': price.quantize(Decimal('0.01')),
+        'image_url': image_url,
+        'category': text('category'),
+        'available': available,
+    }
+
+
+# ==================== IMPORT ====================
+
+def _current(item, field):
+    # image_url is nullable; a file can only say blank
+    value = getattr(item, field)
+    return '' if value is None else value
+
+
+def import_menu(rows, food_partner=None, prune=False, dry_run=False):
+    """Apply a menu file's rows to ``MenuItem``; returns counts of what changed
+
+    Rows are diffed against the current items by ``(food_partner, name)``:
+    new items are bulk-created, changed ones bulk-updated on just the
+    fields in ``UPDATABLE_FIELDS``, and with ``prune`` items missing from
+    the file are marked unavailable (they may be on past orders, so they
+    are never deleted). ``food_partner`` limits the import, and pruning,
+    to that partner's items; rows may then leave the partner blank.
+    Everything happens in one transaction; any bad row raises
+    ``ValueError`` before anything is written.
+    """
+    incoming = {}
+    for number, row in enumerate(rows, start=1):
+        item = clean_row(row, number)
+        if food_partner:
+            item['food_partner'] = item['food_partner'] or food_partner
+            if item['food_partner'] != food_partner:
+                raise ValueError(f'Row {number}: item belongs to {item["food_partner"]!r}, not {food_partner!r}')
+        key = (item['food_partner'], item['name'])
+        if key in incoming:
+            raise ValueError(f'Row {number}: duplicate item {key[1]!r} for {key[0] or "no partner"!r}')
+        incoming[key] = item
+
+    with transaction.atomic():
+        current = MenuItem.objects.select_for_update().order_by('-id')
+        if food_partner:
+            current = current.filter(food_partner=food_partner)
+        existing = {}
+        # Oldest row wins if the table already holds duplicates
+        for item in current:
+            existing[(item.food_partner, item.name)] = item
+
+        to_create, to_update, changed_fields = [], [], set()
+        for key, values in incoming.items():
+            item = existing.get(key)
+            if item is None:
+                to_create.append(MenuItem(**values))
+                continue
+            changed = [
+                field for field in UPDATABLE_FIELDS
+                if _current(item, field) != values[field]
+            ]
+            if changed:
+                for field in changed:
+                    setattr(item, field, values[field])
+                changed_fields.update(changed)
+                to_update.append(item)
+
+        to_disable = []
+        if prune:
+            to_disable = [
+                item.id for key, item in existing.items()
+                if key not in incoming and item.available
+            ]
+
+        summary = {
+            'created': len(to_create),
+            'updated': len(to_update),
+            'unchanged': len(incoming) - len(to_create) - len(to_update),
+            'disabled': len(to_disable),
+        }
+        if dry_run:
+            return summary
+
+        if to_create:
+            MenuItem.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        if to_update:
+            MenuItem.objects.bulk_update(to_update, sorted(changed_fields), batch_size=BATCH_SIZE)
+        if to_disable:
+            MenuItem.objects.filter(id__in=to_disable).update(available=False)
+
+    if to_create or to_update or to_disable:
+        bump_menu_version()
+    return summary
+
+
+# ==================== EXPORT ====================
+
+def export_menu(fmt='csv', food_partner=None):
+    """Yield a menu file in ``fmt`` chunk by chunk, ready to import again"""
+    items = MenuItem.objects.order_by('food_partner', 'name', 'id')
+    if food_partner:
+        items = items.filter(food_partner=food_partner)
+    rows = items.values_list(*MENU_FIELDS).iterator()
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(MENU_FIELDS)
+        for row in rows:
+            writer.writerow(['' if value is None else value for value in row])
+            if buffer.tell() > 8192:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        return
+
+    yield '['
+    for index, row in enumerate(rows):
+        item = dict(zip(MENU_FIELDS, row))
+        item['image_url'] = item['image_url'] or ''
+        yield (',\n' if index else '\n') + json.dumps(item, cls=DjangoJSONEncoder)
+    yield '\n]\n'
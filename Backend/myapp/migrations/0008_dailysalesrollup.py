@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:42
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll up existing orders, as ``rebuild_sales_rollup`` does"""
+    Order = apps.get_model('myapp', 'Order')
+    OrderItem = apps.get_model('myapp', 'OrderItem')
+    DailySalesRollup = apps.get_model('myapp', 'DailySalesRollup')
+    money = DecimalField(max_digits=12, decimal_places=2)
+    rows = defaultdict(lambda: {'order_count': 0, 'item_count': 0, 'revenue': Decimal('0')})
+
+    orders = Order.objects.annotate(day=TruncDate('created_at')).values('day', 'status').annotate(
+        orders=Count('id'), revenue=Sum(ExpressionWrapper(F('total_amount') + F('tip_amount'), output_field=money)),
+    ).order_by()
+    for row in orders:
+        key = (row['day'], '', row['status'])
+        rows[key]['order_count'] = row['orders']
+        rows[key]['revenue'] = row['revenue']
+
+    lines = OrderItem.objects.annotate(day=TruncDate('order__created_at')).values(
+        'day', 'menu_item__food_partner', 'order__status'
+    ).annotate(
+        orders=Count('order', distinct=True),
+        items=Sum('quantity'),
+        revenue=Sum(ExpressionWrapper(F('price_at_purchase') * F('quantity'), output_field=money)),
+    ).order_by()
+    for row in lines:
+        if row['menu_item__food_partner']:
+            rows[(row['day'], row['menu_item__food_partner'], row['order__status'])].update(
+                order_count=row['orders'], item_count=row['items'], revenue=row['revenue']
+            )
+        rows[(row['day'], '', row['order__status'])]['item_count'] += row['items']
+
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(day=day, food_partner=partner, status=status, **values)
+        for (day, partner, status), values in rows.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_order_customer_name_userprofile_full_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('food_partner', models.CharField(blank=True, default='', max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('preparing', 'Preparing'), ('ready', 'Ready for Pickup'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('item_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'ordering': ['day'],
+                'unique_together': {('day', 'food_partner', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
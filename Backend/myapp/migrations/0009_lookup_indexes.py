@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    """Fold duplicate (cart, menu_item) lines into one before adding the constraint"""
+    CartItem = apps.get_model('myapp', 'CartItem')
+    duplicates = CartItem.objects.values('cart_id', 'menu_item_id').annotate(
+        lines=Count('id'), keep=Min('id'), quantity=Sum('quantity')
+    ).filter(lines__gt=1)
+    for dup in duplicates:
+        CartItem.objects.filter(id=dup['keep']).update(quantity=dup['quantity'])
+        CartItem.objects.filter(
+            cart_id=dup['cart_id'], menu_item_id=dup['menu_item_id']
+        ).exclude(id=dup['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_dailysalesrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['session_id'], name='cart_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailysalesrollup',
+            index=models.Index(fields=['food_partner', 'day'], name='rollup_partner_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['food_partner', 'available'], name='menuitem_partner_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['session_id', '-created_at'], name='order_session_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'pickup_date'], name='order_status_pickup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['pickup_date'], name='order_pickup_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'menu_item'), name='unique_cart_menu_item'),
+        ),
+    ]
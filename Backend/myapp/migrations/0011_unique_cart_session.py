@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def merge_duplicate_carts(apps, schema_editor):
+    """Fold every session's extra carts into its oldest one"""
+    Cart = apps.get_model('myapp', 'Cart')
+    CartItem = apps.get_model('myapp', 'CartItem')
+    duplicates = Cart.objects.exclude(session_id=None).values('session_id').annotate(
+        carts=Count('id'), keep=Min('id')
+    ).filter(carts__gt=1)
+    for dup in duplicates:
+        extra_carts = Cart.objects.filter(session_id=dup['session_id']).exclude(id=dup['keep'])
+        for item in CartItem.objects.filter(cart__in=extra_carts):
+            merged = CartItem.objects.filter(cart_id=dup['keep'], menu_item_id=item.menu_item_id)
+            if merged.update(quantity=F('quantity') + item.quantity):
+                item.delete()
+            else:
+                item.cart_id = dup['keep']
+                item.save()
+        extra_carts.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0010_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cart',
+            name='cart_session_idx',
+        ),
+        migrations.RunPython(merge_duplicate_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('session_id__isnull', False)), fields=('session_id',), name='unique_cart_session'),
+        ),
+    ]
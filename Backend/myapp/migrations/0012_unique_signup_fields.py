@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_no_duplicates(apps, schema_editor):
+    """Refuse to migrate while accounts share an email or SR code
+
+    These are people's accounts, so unlike duplicate carts they can't be
+    merged automatically; an admin has to fix them first.
+    """
+    User = apps.get_model('auth', 'User')
+    UserProfile = apps.get_model('myapp', 'UserProfile')
+    emails = list(
+        User.objects.exclude(email='').values('email')
+        .annotate(n=Count('id')).filter(n__gt=1).values_list('email', flat=True)
+    )
+    sr_codes = list(
+        UserProfile.objects.exclude(sr_code='').values('sr_code')
+        .annotate(n=Count('id')).filter(n__gt=1).values_list('sr_code', flat=True)
+    )
+    if emails or sr_codes:
+        raise RuntimeError(
+            'Resolve duplicate accounts before migrating. '
+            f'Shared emails: {emails or "none"}; shared SR codes: {sr_codes or "none"}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_unique_cart_session'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userprofile',
+            constraint=models.UniqueConstraint(condition=models.Q(('sr_code', ''), _negated=True), fields=('sr_code',), name='unique_profile_sr_code'),
+        ),
+        # auth.User belongs to Django, so its email index is created here
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX auth_user_email_uniq ON auth_user (email) WHERE email <> ''",
+            'DROP INDEX auth_user_email_uniq',
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:04
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_snapshots(apps, schema_editor):
+    """Copy each line's current menu item partner and name, in one UPDATE"""
+    MenuItem = apps.get_model('myapp', 'MenuItem')
+    OrderItem = apps.get_model('myapp', 'OrderItem')
+    menu_item = MenuItem.objects.filter(pk=OuterRef('menu_item_id'))
+    OrderItem.objects.update(
+        food_partner=Subquery(menu_item.values('food_partner')[:1]),
+        item_name=Subquery(menu_item.values('name')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_order_delta_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='food_partner',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='item_name',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['food_partner', 'order'], name='orderitem_partner_order_idx'),
+        ),
+    ]
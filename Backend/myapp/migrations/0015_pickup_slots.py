@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:10
+
+from collections import defaultdict
+from datetime import time
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def count_upcoming_orders(apps, schema_editor):
+    """Load rows for live orders picked up from today on"""
+    OrderItem = apps.get_model('myapp', 'OrderItem')
+    PickupSlotLoad = apps.get_model('myapp', 'PickupSlotLoad')
+    rows = defaultdict(lambda: [set(), 0])
+    lines = OrderItem.objects.filter(
+        order__pickup_date__gte=timezone.localdate()
+    ).exclude(order__status='cancelled').exclude(food_partner='').values_list(
+        'food_partner', 'order_id', 'order__pickup_date', 'order__pickup_time', 'quantity'
+    )
+    for partner, order_id, pickup_date, pickup_time, quantity in lines.iterator():
+        minutes = pickup_time.hour * 60 + pickup_time.minute
+        minutes -= minutes % settings.PICKUP_SLOT_MINUTES
+        row = rows[(partner, pickup_date, time(minutes // 60, minutes % 60))]
+        row[0].add(order_id)
+        row[1] += quantity
+    PickupSlotLoad.objects.bulk_create([
+        PickupSlotLoad(
+            food_partner=partner, pickup_date=pickup_date, slot=slot,
+            order_count=len(order_ids), item_count=items,
+        )
+        for (partner, pickup_date, slot), (order_ids, items) in rows.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0014_orderitem_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PickupSlotCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('food_partner', models.CharField(max_length=200, unique=True)),
+                ('max_orders', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_items', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'pickup slot capacities',
+            },
+        ),
+        migrations.CreateModel(
+            name='PickupSlotLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('food_partner', models.CharField(max_length=200)),
+                ('pickup_date', models.DateField()),
+                ('slot', models.TimeField()),
+                ('order_count', models.IntegerField(default=0)),
+                ('item_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('food_partner', 'pickup_date', 'slot')},
+            },
+        ),
+        migrations.RunPython(count_upcoming_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+# The expression must match myapp.search.SEARCH_DOCUMENT exactly
+SEARCH_INDEX_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX menuitem_search_idx ON myapp_menuitem USING gin (("
+    "setweight(to_tsvector('simple', name), 'A') || "
+    "setweight(to_tsvector('simple', food_partner || ' ' || category), 'B') || "
+    "setweight(to_tsvector('simple', description), 'C')))",
+    'CREATE INDEX menuitem_name_trgm_idx ON myapp_menuitem USING gin (name gin_trgm_ops)',
+]
+DROP_SEARCH_INDEX_SQL = [
+    'DROP INDEX IF EXISTS menuitem_name_trgm_idx',
+    'DROP INDEX IF EXISTS menuitem_search_idx',
+]
+
+
+def _run_on_postgres(statements):
+    # Other databases search with the in-process index instead
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_pickup_slots'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run_on_postgres(SEARCH_INDEX_SQL),
+            _run_on_postgres(DROP_SEARCH_INDEX_SQL),
+        ),
+    ]
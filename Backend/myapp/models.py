@@ -1,5 +1,16 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import DecimalField, F, Sum
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+# Sum of quantity * current price over a cart's lines
+CART_LINE_TOTAL = Sum(
+    F('quantity') * F('menu_item__price'),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
 
 
 class UserProfile(models.Model):
@@ -16,6 +27,16 @@ class UserProfile(models.Model):
     sr_code = models.CharField(max_length=20, blank=True)     # NEW
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # Staff accounts have no SR code, so only non-blank codes are unique
+            models.UniqueConstraint(
+                fields=['sr_code'],
+                condition=~models.Q(sr_code=''),
+                name='unique_profile_sr_code',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.role}"
 
@@ -29,6 +50,11 @@ class MenuItem(models.Model):
     available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['food_partner', 'available'], name='menuitem_partner_avail_idx'),
+        ]
+
     def __str__(self):
         return self.name
 class Cart(models.Model):
@@ -37,16 +63,33 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session_id'],
+                condition=models.Q(session_id__isnull=False),
+                name='unique_cart_session',
+            ),
+        ]
+
     def __str__(self):
         return f"Cart {self.id}"
 
+    def summary(self):
+        """Cart total and item count from one aggregate query"""
+        totals = self.items.aggregate(total_price=CART_LINE_TOTAL, total_items=Sum('quantity'))
+        return {
+            'total_price': Decimal(totals['total_price'] or 0).quantize(Decimal('0.01')),
+            'total_items': totals['total_items'] or 0,
+        }
+
     @property
     def total_price(self):
-        return sum(item.subtotal for item in self.items.all())
+        return self.summary()['total_price']
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.summary()['total_items']
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, related_name='items', on_delete=models.CASCADE)
@@ -54,6 +97,11 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'menu_item'], name='unique_cart_menu_item'),
+        ]
+
     def __str__(self):
         return f"{self.quantity}x {self.menu_item.name}"
 
@@ -63,6 +111,14 @@ class CartItem(models.Model):
     
 # models.py - Add these models
 
+class OrderQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # auto_now only runs on save(); bulk updates must move updated_at too
+        # or the delta-sync feed never sees them
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -85,20 +141,46 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     def __str__(self):
         return f"Order #{self.id} - {self.status}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['session_id', '-created_at'], name='order_session_created_idx'),
+            models.Index(fields=['status', 'pickup_date'], name='order_status_pickup_idx'),
+            models.Index(fields=['pickup_date'], name='order_pickup_date_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='order_updated_id_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     menu_item = models.ForeignKey(MenuItem, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField()
     price_at_purchase = models.DecimalField(max_digits=10, decimal_places=2)
+    # Snapshots taken at purchase, like the price: renaming a menu item or
+    # moving it to another partner doesn't rewrite past orders
+    food_partner = models.CharField(max_length=200, blank=True, default='')
+    item_name = models.CharField(max_length=200, blank=True, default='')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['food_partner', 'order'], name='orderitem_partner_order_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.quantity}x {self.menu_item.name}"
+        return f"{self.quantity}x {self.item_name}"
+    
+    def save(self, *args, **kwargs):
+        # Take the snapshots if the caller didn't (bulk_create skips this,
+        # so create_order sets them itself)
+        if self._state.adding and not self.item_name:
+            self.food_partner = self.menu_item.food_partner
+            self.item_name = self.menu_item.name
+        super().save(*args, **kwargs)
     
     @property
     def subtotal(self):
@@ -126,4 +208,90 @@ class Food_Partners(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.store
\ No newline at end of file
+        return self.store
+
+class DailySalesRollup(models.Model):
+    """Per-day order totals kept in step with Order writes.
+
+    ``food_partner`` is blank for whole-order totals (revenue includes tips);
+    partner rows hold that partner's line revenue only.
+    """
+    day = models.DateField()
+    food_partner = models.CharField(max_length=200, blank=True, default='')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    item_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = [['day', 'food_partner', 'status']]
+        ordering = ['day']
+        indexes = [
+            models.Index(fields=['food_partner', 'day'], name='rollup_partner_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.food_partner or 'All'} {self.status}: {self.revenue}"
+
+
+class IdempotencyKey(models.Model):
+    """Stored response for a client-supplied ``Idempotency-Key`` header"""
+    key = models.CharField(max_length=255, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response_body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} -> {self.status_code}"
+
+
+class OrderTombstone(models.Model):
+    """Record of a deleted order, so delta-sync clients can drop it
+
+    One row per food partner with lines in the order, plus one with a
+    blank partner for whole-order feeds.
+    """
+    order_id = models.BigIntegerField()
+    food_partner = models.CharField(max_length=200, blank=True, default='')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['food_partner', 'id'], name='tombstone_partner_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id} deleted ({self.food_partner or 'All'})"
+
+
+class PickupSlotCapacity(models.Model):
+    """Orders and items a food partner's kitchen takes per pickup slot
+
+    A blank limit means no limit; partners without a row are unlimited.
+    """
+    food_partner = models.CharField(max_length=200, unique=True)
+    max_orders = models.PositiveIntegerField(null=True, blank=True)
+    max_items = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'pickup slot capacities'
+
+    def __str__(self):
+        return f"{self.food_partner}: {self.max_orders or '-'} orders / {self.max_items or '-'} items"
+
+
+class PickupSlotLoad(models.Model):
+    """Live (non-cancelled) orders and items booked into one partner's slot"""
+    food_partner = models.CharField(max_length=200)
+    pickup_date = models.DateField()
+    slot = models.TimeField()
+    order_count = models.IntegerField(default=0)
+    item_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [['food_partner', 'pickup_date', 'slot']]
+
+    def __str__(self):
+        return f"{self.food_partner} {self.pickup_date} {self.slot}: {self.order_count} orders"
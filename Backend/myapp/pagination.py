@@ -0,0 +1,219 @@
+import base64
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, OrderTombstone
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+VALID_STATUSES = [choice for choice, _ in Order.STATUS_CHOICES]
+
+
+# ==================== ORDER FILTERS ====================
+
+def _parse_bound(value, name, end_of_day=False):
+    """Parse a ``since``/``until`` value given as an ISO date or datetime"""
+    day = parse_date(value) if len(value) == 10 else None
+    if day is not None:
+        if end_of_day:
+            day += timedelta(days=1)
+        parsed = datetime.combine(day, time.min)
+    else:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'Invalid {name}: expected ISO date or datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_statuses(value):
+    """Split and validate a comma-separated ``status`` parameter"""
+    statuses = [s.strip() for s in value.split(',') if s.strip()]
+    invalid = [s for s in statuses if s not in VALID_STATUSES]
+    if invalid:
+        raise ValueError(f'Invalid status: {", ".join(invalid)}')
+    return statuses
+
+
+def filter_orders(queryset, params):
+    """Apply the ``since``/``until``/``status``/``pickup_date`` query filters
+
+    ``since`` is inclusive and ``until`` exclusive, both on ``created_at``.
+    A plain date for ``until`` covers that whole day. ``status`` accepts a
+    comma-separated list.
+    """
+    since = params.get('since')
+    if since:
+        queryset = queryset.filter(created_at__gte=_parse_bound(since, 'since'))
+
+    until = params.get('until')
+    if until:
+        queryset = queryset.filter(created_at__lt=_parse_bound(until, 'until', end_of_day=True))
+
+    status = params.get('status')
+    if status:
+        queryset = queryset.filter(status__in=parse_statuses(status))
+
+    pickup_date = params.get('pickup_date')
+    if pickup_date:
+        day = parse_date(pickup_date)
+        if day is None:
+            raise ValueError('Invalid pickup_date: expected YYYY-MM-DD')
+        queryset = queryset.filter(pickup_date=day)
+
+    return queryset
+
+
+# ==================== KEYSET PAGINATION ====================
+
+def encode_cursor(order):
+    """Opaque cursor pointing just past ``order`` in (-created_at, -id) order"""
+    raw = f'{order.created_at.isoformat()}|{order.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of ``encode_cursor``; returns ``(created_at, id)``"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, order_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError
+        return created_at, int(order_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def wants_page(params):
+    """Pagination is opt-in so existing clients keep getting full lists"""
+    return 'limit' in params or 'cursor' in params
+
+
+def paginate_orders(queryset, params):
+    """Return ``(orders, next_cursor)`` for one keyset page
+
+    Orders are walked newest first on ``(created_at, id)``, matching
+    ``Order.Meta.ordering`` with ``id`` as a tie-breaker, so each page is a
+    single index range scan no matter how deep the client has paged.
+    ``next_cursor`` is ``None`` on the last page.
+    """
+    try:
+        limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('Invalid limit')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    queryset = queryset.order_by('-created_at', '-id')
+
+    cursor = params.get('cursor')
+    if cursor:
+        created_at, order_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) |
+            Q(created_at=created_at, id__lt=order_id)
+        )
+
+    orders = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1])
+    return orders, next_cursor
+
+
+def list_orders(queryset, params):
+    """Filter and, if requested, paginate an order listing
+
+    Returns ``(orders, page_info)`` where ``page_info`` holds
+    ``next_cursor`` for paginated requests and is empty otherwise.
+    """
+    queryset = filter_orders(queryset, params)
+    if not wants_page(params):
+        return queryset.order_by('-created_at'), {}
+    orders, next_cursor = paginate_orders(queryset, params)
+    return orders, {'next_cursor': next_cursor}
+
+
+# ==================== DELTA SYNC ====================
+
+# Changes newer than this may still belong to uncommitted transactions
+# (updated_at is set before commit), so a feed only reaches up to now - SETTLE
+# and a cursor never skips past a change that commits late
+DELTA_SYNC_SETTLE = timedelta(seconds=2)
+
+
+def encode_sync_cursor(updated_at, order_id, tombstone_id):
+    raw = f'{updated_at.isoformat() if updated_at else ""}|{order_id}|{tombstone_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_sync_cursor(cursor):
+    """Inverse of ``encode_sync_cursor``; an empty cursor means from the start"""
+    if not cursor:
+        return None, 0, 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        updated_at, order_id, tombstone_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        parsed = parse_datetime(updated_at) if updated_at else None
+        if updated_at and parsed is None:
+            raise ValueError
+        return parsed, int(order_id), int(tombstone_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid changes_since cursor')
+
+
+def wants_changes(params):
+    """``changes_since`` (empty for a first sync) switches to the delta feed"""
+    return 'changes_since' in params
+
+
+def order_changes(queryset, params, partner_name=''):
+    """Orders changed and order ids deleted since a ``changes_since`` cursor
+
+    Orders are walked on ``(updated_at, id)`` and tombstones on their id,
+    each capped at ``limit``. Returns ``(orders, deleted_ids, page_info)``
+    where ``page_info`` holds the cursor for the next poll and whether more
+    changes are already waiting. The ``since``/``status`` filters don't
+    apply here: an order leaving a filter is itself a change to report.
+    """
+    try:
+        limit = int(params.get('limit', MAX_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('Invalid limit')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    updated_at, order_id, tombstone_id = decode_sync_cursor(params.get('changes_since'))
+    horizon = timezone.now() - DELTA_SYNC_SETTLE
+
+    queryset = queryset.filter(updated_at__lt=horizon).order_by('updated_at', 'id')
+    if updated_at is not None:
+        queryset = queryset.filter(
+            Q(updated_at__gt=updated_at) |
+            Q(updated_at=updated_at, id__gt=order_id)
+        )
+    orders = list(queryset[:limit + 1])
+
+    tombstones = list(
+        OrderTombstone.objects.filter(
+            food_partner=partner_name or '', id__gt=tombstone_id, deleted_at__lt=horizon
+        ).order_by('id').values_list('id', 'order_id')[:limit + 1]
+    )
+
+    has_more = len(orders) > limit or len(tombstones) > limit
+    orders, tombstones = orders[:limit], tombstones[:limit]
+    if orders:
+        updated_at, order_id = orders[-1].updated_at, orders[-1].id
+    if tombstones:
+        tombstone_id = tombstones[-1][0]
+
+    return orders, [deleted for _, deleted in tombstones], {
+        'next_changes_since': encode_sync_cursor(updated_at, order_id, tombstone_id),
+        'has_more': has_more,
+    }
+
@@ -0,0 +1,71 @@
+"""``?fields=`` projection and the compact (columnar) list format
+
+``fields=id,name,price`` trims every row to those fields, and views load
+only the columns behind them. ``format=compact`` sends a list as one
+array per field instead of one object per row::
+
+    {"format": "compact",
+     "items": {"count": 2,
+               "columns": {"id": [4, 7], "food_partner": [0, 0], "category": [1, 2]},
+               "dictionary_columns": ["food_partner", "category"]},
+     "strings": ["Jollibee", "Meals", "Drinks"]}
+
+Columns listed in ``dictionary_columns`` hold indexes into ``strings``,
+which a response shares between all its tables, so a partner name or an
+item name repeated on hundreds of rows is sent once.
+"""
+
+
+FORMATS = ('full', 'compact')
+
+
+def parse_fields(value, allowed):
+    """Fields named in a ``fields=`` value, in request order; all of ``allowed`` if blank"""
+    if not value:
+        return list(allowed)
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if field and field not in fields:
+            fields.append(field)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f'Unknown field(s): {", ".join(unknown)}; choose from {", ".join(allowed)}')
+    if not fields:
+        raise ValueError('fields must name at least one field')
+    return fields
+
+
+def is_compact(params):
+    """Whether ``format=compact`` was asked for (``full`` is the default)"""
+    fmt = params.get('format') or 'full'
+    if fmt not in FORMATS:
+        raise ValueError(f'format must be one of {", ".join(FORMATS)}')
+    return fmt == 'compact'
+
+
+class StringTable:
+    """The ``strings`` dictionary of one compact response"""
+
+    def __init__(self):
+        self.strings = []
+        self._codes = {}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+
+def column_table(rows, fields, strings, dictionary_fields=()):
+    """``rows`` (dicts) as a compact table; ``dictionary_fields`` go through ``strings``"""
+    coded = [field for field in fields if field in dictionary_fields]
+    columns = {}
+    for field in fields:
+        if field in dictionary_fields:
+            columns[field] = [strings.code(row[field]) for row in rows]
+        else:
+            columns[field] = [row[field] for row in rows]
+    return {'count': len(rows), 'columns': columns, 'dictionary_columns': coded}
@@ -0,0 +1,78 @@
+"""JSON encoding for API responses
+
+``dumps`` turns a payload into UTF-8 bytes with the renderer chosen by
+``settings.JSON_RENDERER``: ``'auto'`` uses orjson when it is installed
+and the stdlib encoder otherwise, or give the dotted path of any
+``dumps(data) -> bytes``. Both built-in renderers write ``Decimal`` as
+its string, dates, times and datetimes as ``isoformat()``, and no
+whitespace, so they produce the same bytes and serializers can hand them
+model values without converting each one.
+"""
+import json
+from datetime import date, time
+from decimal import Decimal
+from uuid import UUID
+
+from django import http
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def stdlib_dumps(data):
+    return json.dumps(data, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def orjson_dumps(data):
+    # Decimal still goes through _default; orjson has no Decimal type
+    return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+_dumps = None
+
+
+def get_renderer():
+    """The configured ``dumps`` function, resolved once"""
+    global _dumps
+    if _dumps is None:
+        if settings.JSON_RENDERER == 'auto':
+            _dumps = orjson_dumps if orjson is not None else stdlib_dumps
+        else:
+            _dumps = import_string(settings.JSON_RENDERER)
+    return _dumps
+
+
+def dumps(data):
+    return get_renderer()(data)
+
+
+class JsonResponse(http.JsonResponse):
+    """``django.http.JsonResponse`` encoded by the configured renderer
+
+    Passing ``encoder`` or ``json_dumps_params`` falls back to Django's
+    encoding.
+    """
+
+    def __init__(self, data, encoder=None, safe=True, json_dumps_params=None, **kwargs):
+        if encoder is not None or json_dumps_params is not None:
+            super().__init__(data, encoder or DjangoJSONEncoder, safe, json_dumps_params, **kwargs)
+            return
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        http.HttpResponse.__init__(self, content=dumps(data), **kwargs)
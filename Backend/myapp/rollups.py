@@ -0,0 +1,139 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .counters import add_counts
+from .models import DailySalesRollup, Order, OrderItem
+
+
+LINE_REVENUE = ExpressionWrapper(
+    F('price_at_purchase') * F('quantity'),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
+ORDER_REVENUE = ExpressionWrapper(
+    F('total_amount') + F('tip_amount'),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
+
+
+# ==================== INCREMENTAL UPDATES ====================
+
+def _contributions(order, items=None):
+    """What ``order`` adds to each rollup partner key: ``{partner: (items, revenue)}``
+
+    ``items`` may be the order's freshly built OrderItem objects to save
+    re-reading them.
+    """
+    if items is None:
+        lines = OrderItem.objects.filter(order=order).values(
+            'food_partner'
+        ).annotate(items=Sum('quantity'), revenue=Sum(LINE_REVENUE))
+    else:
+        grouped = defaultdict(lambda: [0, Decimal('0')])
+        for item in items:
+            grouped[item.food_partner][0] += item.quantity
+            grouped[item.food_partner][1] += item.subtotal
+        lines = [
+            {'food_partner': partner, 'items': qty, 'revenue': revenue}
+            for partner, (qty, revenue) in grouped.items()
+        ]
+
+    totals = {}
+    item_total = 0
+    for line in lines:
+        if line['food_partner']:
+            totals[line['food_partner']] = (line['items'], line['revenue'])
+        item_total += line['items']
+    # Whole-order row, keyed by the blank partner
+    totals[''] = (item_total, order.total_amount + order.tip_amount)
+    return totals
+
+
+def _apply(order, status, sign, contributions):
+    """Add ``sign`` times an order's contributions to its day's rollup rows"""
+    day = timezone.localdate(order.created_at)
+    # Rows in partner order, as reserve_slots does, so two orders sharing
+    # partners lock their rollup rows in the same sequence
+    add_counts(DailySalesRollup, ('day', 'food_partner', 'status'), [
+        {
+            'day': day, 'food_partner': partner, 'status': status,
+            'order_count': sign, 'item_count': sign * items, 'revenue': sign * Decimal(revenue),
+        }
+        for partner, (items, revenue) in sorted(contributions.items())
+    ])
+
+
+def record_order_created(order, items=None):
+    """Count a freshly placed order (call inside the creating transaction)"""
+    _apply(order, order.status, 1, _contributions(order, items))
+
+
+def record_status_change(order, old_status):
+    """Move an order's totals from ``old_status`` to its current status"""
+    if old_status == order.status:
+        return
+    contributions = _contributions(order)
+    _apply(order, old_status, -1, contributions)
+    _apply(order, order.status, 1, contributions)
+
+
+def record_order_edit(order, previous):
+    """Move an order's totals after an edit (e.g. in the Django admin)
+
+    ``previous`` is the order as saved before the edit; its status, total
+    and tip may all differ from ``order``'s.
+    """
+    if (previous.status, previous.total_amount, previous.tip_amount) == (
+        order.status, order.total_amount, order.tip_amount
+    ):
+        return
+    contributions = _contributions(order)
+    items, _ = contributions['']
+    _apply(previous, previous.status, -1, dict(contributions, **{'': (items, previous.total_amount + previous.tip_amount)}))
+    _apply(order, order.status, 1, contributions)
+
+
+def record_order_deleted(order):
+    """Take a deleted order out of its rollups (call before its lines go)"""
+    _apply(order, order.status, -1, _contributions(order))
+
+
+# ==================== FULL REBUILD ====================
+
+@transaction.atomic
+def rebuild_rollups():
+    """Recompute every rollup row from Order/OrderItem; returns rows written"""
+    rows = defaultdict(lambda: {'order_count': 0, 'item_count': 0, 'revenue': Decimal('0')})
+
+    orders = Order.objects.annotate(day=TruncDate('created_at')).values(
+        'day', 'status'
+    ).annotate(orders=Count('id'), revenue=Sum(ORDER_REVENUE)).order_by()
+    for row in orders:
+        key = (row['day'], '', row['status'])
+        rows[key]['order_count'] = row['orders']
+        rows[key]['revenue'] = row['revenue']
+
+    lines = OrderItem.objects.annotate(day=TruncDate('order__created_at')).values(
+        'day', 'food_partner', 'order__status'
+    ).annotate(
+        orders=Count('order', distinct=True),
+        items=Sum('quantity'),
+        revenue=Sum(LINE_REVENUE),
+    ).order_by()
+    for row in lines:
+        if row['food_partner']:
+            rows[(row['day'], row['food_partner'], row['order__status'])].update(
+                order_count=row['orders'], item_count=row['items'], revenue=row['revenue']
+            )
+        rows[(row['day'], '', row['order__status'])]['item_count'] += row['items']
+
+    DailySalesRollup.objects.all().delete()
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(day=day, food_partner=partner, status=status, **values)
+        for (day, partner, status), values in rows.items()
+    ])
+    return len(rows)
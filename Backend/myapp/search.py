@@ -0,0 +1,204 @@
+"""Menu search over item name, description, category and food partner
+
+On PostgreSQL a query is one statement against two GIN indexes created by
+migration 0016: a weighted ``tsvector`` expression index for prefix
+matches on whole words, and a trigram index on ``name`` for typos.
+Other databases use ``InvertedIndex``, built in process from the menu and
+rebuilt lazily whenever the menu version changes, so every menu write
+(which bumps the version) is picked up on the next search. With the
+per-process cache another worker's writes don't change this process's
+version, so the index is also rebuilt after ``MENU_CACHE_TIMEOUT``, the
+same bound cached menu payloads have.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .menu_cache import get_menu_version
+from .models import MenuItem
+
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_OFFSET = 1000
+MAX_TERMS = 8
+
+AVAILABILITY = {'true': True, 'false': False, 'all': None}
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower())
+
+
+def serialize_menu_item(item):
+    return {
+        'id': item.id,
+        'name': item.name,
+        'description': item.description,
+        'price': str(item.price),
+        'image_url': item.image_url,
+        'category': item.category,
+        'food_partner': item.food_partner,
+        'available': item.available,
+    }
+
+
+def search_menu(query, available=True, food_partner='', category='', limit=DEFAULT_SEARCH_LIMIT, offset=0):
+    """One ranked page of items matching every word of ``query``
+
+    Returns ``(items, next_offset)``; ``next_offset`` is ``None`` on the
+    last page, and past ``MAX_SEARCH_OFFSET``, where views clamp offsets
+    (so following it can't loop on one page). ``available=None`` includes
+    unavailable items.
+    """
+    terms = tokenize(query)[:MAX_TERMS]
+    if not terms:
+        return [], None
+    search = _search_postgres if connection.vendor == 'postgresql' else _search_in_process
+    items = search(terms, available, food_partner, category, limit + 1, offset)
+    if len(items) > limit:
+        next_offset = offset + limit
+        return items[:limit], next_offset if next_offset <= MAX_SEARCH_OFFSET else None
+    return items, None
+
+
+# ==================== POSTGRESQL ====================
+
+# Must stay identical to the expression indexed in migration 0016, or the
+# planner can't use the index; change both together
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple', name), 'A') || "
+    "setweight(to_tsvector('simple', food_partner || ' ' || category), 'B') || "
+    "setweight(to_tsvector('simple', description), 'C')"
+)
+
+
+def _search_postgres(terms, available, food_partner, category, limit, offset):
+    # Every word as a prefix, e.g. "chick joy" -> chick:* & joy:*
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    text = ' '.join(terms)
+    matches = RawSQL(
+        f"({SEARCH_DOCUMENT}) @@ to_tsquery('simple', %s) OR %s <%% name",
+        [tsquery, text], output_field=BooleanField(),
+    )
+    rank = RawSQL(
+        f"ts_rank({SEARCH_DOCUMENT}, to_tsquery('simple', %s)) + word_similarity(%s, name)",
+        [tsquery, text], output_field=FloatField(),
+    )
+    items = MenuItem.objects.filter(matches).annotate(rank=rank)
+    if available is not None:
+        items = items.filter(available=available)
+    if food_partner:
+        items = items.filter(food_partner=food_partner)
+    if category:
+        items = items.filter(category=category)
+    items = items.order_by('-rank', 'name', 'id')[offset:offset + limit]
+    return [serialize_menu_item(item) for item in items]
+
+
+# ==================== IN-PROCESS INDEX ====================
+
+FIELD_WEIGHTS = (('name', 1.0), ('food_partner', 0.6), ('category', 0.6), ('description', 0.3))
+PREFIX_MATCH = 0.8
+TYPO_MATCH = 0.5
+# Shorter words get too many false typo matches ("tea" / "pea")
+TYPO_MIN_LENGTH = 4
+
+
+def _variants(word):
+    """``word`` and every way of deleting one letter from it
+
+    Two words within one insertion, deletion, substitution or adjacent
+    swap of each other share a variant.
+    """
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+class InvertedIndex:
+    """Word -> item postings over a menu snapshot, with prefix and typo lookup"""
+
+    def __init__(self, items):
+        self.items = {item['id']: item for item in items}
+        self.postings = defaultdict(dict)
+        for item in items:
+            for field, weight in FIELD_WEIGHTS:
+                for word in tokenize(item[field] or ''):
+                    if weight > self.postings[word].get(item['id'], 0):
+                        self.postings[word][item['id']] = weight
+        self.words = sorted(self.postings)
+        self.typos = defaultdict(set)
+        for word in self.words:
+            if len(word) >= TYPO_MIN_LENGTH - 1:
+                for variant in _variants(word):
+                    self.typos[variant].add(word)
+
+    def expand(self, term):
+        """``{word: match quality}`` for the indexed words ``term`` can stand for"""
+        found = {}
+        i = bisect_left(self.words, term)
+        while i < len(self.words) and self.words[i].startswith(term):
+            word = self.words[i]
+            found[word] = 1.0 if word == term else PREFIX_MATCH
+            i += 1
+        if len(term) >= TYPO_MIN_LENGTH:
+            for variant in _variants(term):
+                for word in self.typos.get(variant, ()):
+                    found.setdefault(word, TYPO_MATCH)
+        return found
+
+    def search(self, terms):
+        """``[(score, item)]`` for items matching every term, best first"""
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for word, quality in self.expand(term).items():
+                for item_id, weight in self.postings[word].items():
+                    term_scores[item_id] = max(term_scores.get(item_id, 0), weight * quality)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {item_id: scores[item_id] + score for item_id, score in term_scores.items() if item_id in scores}
+            if not scores:
+                return []
+        ranked = [(score, self.items[item_id]) for item_id, score in scores.items()]
+        ranked.sort(key=lambda entry: (-entry[0], entry[1]['name'], entry[1]['id']))
+        return ranked
+
+
+_index_lock = threading.Lock()
+_index = (None, 0, None)
+
+
+def get_inverted_index():
+    """The in-process index for the current menu version, rebuilt if stale"""
+    global _index
+    token, _ = get_menu_version()
+
+    def fresh():
+        built_for, built_at, index = _index
+        return built_for == token and time.monotonic() - built_at < settings.MENU_CACHE_TIMEOUT
+
+    if not fresh():
+        with _index_lock:
+            if not fresh():
+                built_at = time.monotonic()
+                items = [serialize_menu_item(item) for item in MenuItem.objects.all()]
+                _index = (token, built_at, InvertedIndex(items))
+    return _index[2]
+
+
+def _search_in_process(terms, available, food_partner, category, limit, offset):
+    items = (
+        item for _, item in get_inverted_index().search(terms)
+        if (available is None or item['available'] == available)
+        and (not food_partner or item['food_partner'] == food_partner)
+        and (not category or item['category'] == category)
+    )
+    return [item for _, item in zip(range(offset + limit), items)][offset:]
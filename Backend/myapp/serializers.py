@@ -0,0 +1,187 @@
+from django.db.models import Prefetch
+
+from .models import Order, OrderItem
+from .projection import StringTable, column_table, parse_fields
+
+
+# ==================== MENU SERIALIZATION ====================
+
+MENU_ITEM_FIELDS = ('id', 'name', 'description', 'price', 'image_url', 'category', 'food_partner', 'available')
+MENU_ITEM_DICTIONARY_FIELDS = ('food_partner', 'category', 'price')
+
+
+def menu_item_rows(queryset, fields=MENU_ITEM_FIELDS):
+    """Menu items as dicts of ``fields``, read with ``.values()`` (no model instances)"""
+    # Prices stay Decimal; the JSON renderer writes them as strings
+    return list(queryset.values(*fields))
+
+
+def menu_items_payload(rows, fields, compact):
+    """``{'items': rows}``, or the rows as a compact table"""
+    if not compact:
+        return {'items': rows}
+    strings = StringTable()
+    return {
+        'format': 'compact',
+        'items': column_table(rows, fields, strings, MENU_ITEM_DICTIONARY_FIELDS),
+        'strings': strings.strings,
+    }
+
+
+# ==================== ORDER SERIALIZATION ====================
+
+ORDER_FIELDS = (
+    'id', 'total', 'tip', 'payment_method', 'pickup_date', 'pickup_time',
+    'status', 'created_at', 'customer_name', 'items',
+)
+ORDER_ITEM_FIELDS = ('name', 'quantity', 'price', 'subtotal', 'food_partner')
+
+# Model columns behind each serialized field, so projections can .only() them
+_ORDER_COLUMNS = {
+    'id': (), 'total': ('total_amount', 'tip_amount'), 'tip': ('tip_amount',),
+    'payment_method': ('payment_method',), 'pickup_date': ('pickup_date',),
+    'pickup_time': ('pickup_time',), 'status': ('status',), 'created_at': ('created_at',),
+    'customer_name': ('customer_name', 'session_id'), 'items': (),
+}
+_ITEM_COLUMNS = {
+    'name': ('item_name',), 'quantity': ('quantity',), 'price': ('price_at_purchase',),
+    'subtotal': ('price_at_purchase', 'quantity'), 'food_partner': ('food_partner',),
+}
+
+# Strings repeated across rows, sent once each in the compact format
+ORDER_DICTIONARY_FIELDS = ('payment_method', 'pickup_date', 'status')
+ORDER_ITEM_DICTIONARY_FIELDS = ('name', 'food_partner', 'price')
+
+
+def order_fields(params, include_partner=True):
+    """``(fields, item_fields)`` picked by ``?fields=``
+
+    Line fields are named ``items.<field>``; ``items`` alone means every
+    line field, and naming a line field implies ``items``.
+    """
+    item_allowed = ORDER_ITEM_FIELDS if include_partner else ORDER_ITEM_FIELDS[:-1]
+    requested = parse_fields(
+        params.get('fields'), ORDER_FIELDS + tuple(f'items.{field}' for field in item_allowed)
+    )
+    fields = [field for field in requested if not field.startswith('items.')]
+    item_fields = [field[len('items.'):] for field in requested if field.startswith('items.')]
+    if item_fields and 'items' not in fields:
+        fields.append('items')
+    if 'items' in fields and not item_fields:
+        item_fields = list(item_allowed)
+    return fields, item_fields
+
+
+def order_queryset(partner_name=None, fields=ORDER_FIELDS, item_fields=ORDER_ITEM_FIELDS):
+    """Orders with their line items loaded up front.
+
+    The whole page costs two queries (orders + items) no matter how many
+    orders it holds; lines carry their own partner and name snapshots, so
+    menu items aren't joined. When ``partner_name`` is given only that
+    partner's lines are attached, as ``order.partner_items``, and orders are
+    found through the ``(food_partner, order)`` index on OrderItem.
+    A projection (``fields``/``item_fields``) loads only the columns it
+    serializes, and skips the items query when ``items`` isn't wanted.
+    """
+    queryset = Order.objects.all()
+    if tuple(fields) != ORDER_FIELDS:
+        # Page cursors are built from created_at, so it always comes along
+        queryset = queryset.only('id', 'created_at', *{column for field in fields for column in _ORDER_COLUMNS[field]})
+
+    items = OrderItem.objects.all()
+    if tuple(item_fields) != ORDER_ITEM_FIELDS:
+        items = items.only('id', 'order', *{column for field in item_fields for column in _ITEM_COLUMNS[field]})
+
+    if partner_name is None:
+        if 'items' not in fields:
+            return queryset
+        return queryset.prefetch_related(Prefetch('items', queryset=items))
+
+    partner_items = items.filter(food_partner=partner_name)
+    return queryset.filter(
+        id__in=OrderItem.objects.filter(food_partner=partner_name).values('order_id')
+    ).prefetch_related(
+        Prefetch('items', queryset=partner_items, to_attr='partner_items')
+    )
+
+
+# Decimals, dates and times are left to the JSON renderer (see renderers)
+_ITEM_VALUES = {
+    'name': lambda item: item.item_name,
+    'quantity': lambda item: item.quantity,
+    'price': lambda item: item.price_at_purchase,
+    'subtotal': lambda item: item.subtotal,
+    'food_partner': lambda item: item.food_partner,
+}
+_ORDER_VALUES = {
+    'id': lambda order: order.id,
+    'tip': lambda order: order.tip_amount,
+    'payment_method': lambda order: order.payment_method,
+    'pickup_date': lambda order: order.pickup_date,
+    'pickup_time': lambda order: order.pickup_time,
+    'status': lambda order: order.status,
+    'created_at': lambda order: order.created_at,
+}
+
+
+def serialize_order_item(item, include_partner=True, fields=None):
+    """Serialize a single order line"""
+    if fields is None:
+        fields = ORDER_ITEM_FIELDS if include_partner else ORDER_ITEM_FIELDS[:-1]
+    return {field: _ITEM_VALUES[field](item) for field in fields}
+
+
+def serialize_order(order, items=None, total=None, include_partner=True, guest_label='Customer',
+                    fields=ORDER_FIELDS, item_fields=None):
+    """Serialize an order loaded through ``order_queryset``
+
+    Only ``fields`` are read from the order, so a projected queryset never
+    loads a deferred column here.
+    """
+    data = {}
+    for field in fields:
+        value = _ORDER_VALUES.get(field)
+        if value is not None:
+            data[field] = value(order)
+        elif field == 'total':
+            data['total'] = order.total_amount + order.tip_amount if total is None else total
+        elif field == 'customer_name':
+            data['customer_name'] = order.customer_name or f'{guest_label} #{order.session_id[:8]}'
+        else:
+            if items is None:
+                items = order.items.all()
+            data['items'] = [serialize_order_item(item, include_partner, item_fields) for item in items]
+    return data
+
+
+def serialize_partner_order(order):
+    """Serialize an order as seen by one partner (only their lines and share)"""
+    items = order.partner_items
+    return serialize_order(
+        order,
+        items=items,
+        total=sum(item.subtotal for item in items),
+    )
+
+
+def compact_orders(orders_data, fields, item_fields):
+    """Serialized orders in the compact format of ``projection``
+
+    Lines go in a separate ``items`` table whose ``order`` column is the
+    index of their order in the ``orders`` table.
+    """
+    strings = StringTable()
+    payload = {
+        'format': 'compact',
+        'orders': column_table(
+            orders_data, [field for field in fields if field != 'items'], strings, ORDER_DICTIONARY_FIELDS
+        ),
+    }
+    if 'items' in fields:
+        lines = [
+            dict(line, order=index)
+            for index, order in enumerate(orders_data) for line in order['items']
+        ]
+        payload['items'] = column_table(lines, ['order', *item_fields], strings, ORDER_ITEM_DICTIONARY_FIELDS)
+    payload['strings'] = strings.strings
+    return payload
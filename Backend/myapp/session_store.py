@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+from .cache import FailSoftCache
+
+
+class SessionStore(CachedDBStore):
+    """Write-through cached sessions that keep working when the cache is down
+
+    Reads hit the cache first and the ``django_session`` table on a miss;
+    writes go to both. Django's ``cached_db`` already tolerates cache errors
+    on load and save, but not when refilling the cache, checking
+    ``exists()`` or deleting on logout; the fail-soft proxy covers those.
+    """
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = FailSoftCache(settings.SESSION_CACHE_ALIAS)
@@ -0,0 +1,33 @@
+from django.db.models import Sum
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import Order, OrderItem, OrderTombstone
+from .rollups import record_order_deleted
+from .slots import release_slots
+
+
+@receiver(pre_delete, sender=Order)
+def record_order_tombstones(sender, instance, **kwargs):
+    """Leave tombstones for the delta-sync feed (in the deleting transaction)
+
+    Runs before the delete so the order's lines, and with them its
+    partners, can still be read. A live order also frees its pickup slot.
+    """
+    demand = dict(
+        OrderItem.objects.filter(order=instance).exclude(food_partner='')
+        .values_list('food_partner').annotate(items=Sum('quantity')).order_by()
+    )
+    partners = set(demand)
+    if instance.status != 'cancelled':
+        release_slots(instance, demand)
+    OrderTombstone.objects.bulk_create([
+        OrderTombstone(order_id=instance.pk, food_partner=partner)
+        for partner in sorted(partners) + ['']
+    ])
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_rollups(sender, instance, **kwargs):
+    """Subtract a deleted order from the sales rollups while its lines still exist"""
+    record_order_deleted(instance)
@@ -0,0 +1,267 @@
+"""Pickup-slot capacity for food partners
+
+Pickup times fall into slots of ``settings.PICKUP_SLOT_MINUTES``. A
+partner with a ``PickupSlotCapacity`` row takes at most ``max_orders``
+orders and ``max_items`` items per slot. ``PickupSlotLoad`` counts what
+each slot has booked and is kept in step with Order writes, like the
+sales rollups: ``create_order`` books every partner without a capacity in
+one upsert and each capped partner with a conditional UPDATE, and
+cancelling or deleting an order gives its slot back. Loads
+are counted for every partner, so a capacity added later starts from the
+real numbers. After changing ``PICKUP_SLOT_MINUTES``, run
+``manage.py rebuild_pickup_slots``.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .counters import add_counts
+from .models import CartItem, OrderItem, PickupSlotCapacity, PickupSlotLoad
+
+
+MAX_SLOTS = 96
+
+
+class SlotFull(Exception):
+    """A partner has no room left for the order in its pickup slot"""
+
+    def __init__(self, food_partner, pickup_date, slot):
+        self.food_partner = food_partner
+        self.pickup_date = pickup_date
+        self.slot = slot
+        super().__init__(
+            f'{food_partner} is fully booked for {slot:%H:%M} pickup; choose another time'
+        )
+
+
+# ==================== SLOT ARITHMETIC ====================
+
+def slot_of(pickup_time):
+    """Start of the slot ``pickup_time`` falls in"""
+    minutes = pickup_time.hour * 60 + pickup_time.minute
+    minutes -= minutes % settings.PICKUP_SLOT_MINUTES
+    return time(minutes // 60, minutes % 60)
+
+
+def upcoming_slots(start, count):
+    """``count`` consecutive ``(date, slot)`` pairs from the slot after ``start``"""
+    step = timedelta(minutes=settings.PICKUP_SLOT_MINUTES)
+    current = datetime.combine(start.date(), slot_of(start.time()))
+    if current < start.replace(tzinfo=None):
+        current += step
+    slots = []
+    for _ in range(count):
+        slots.append((current.date(), current.time()))
+        current += step
+    return slots
+
+
+def partner_demand(items):
+    """``{food_partner: item_count}`` for order or cart lines"""
+    demand = defaultdict(int)
+    for item in items:
+        partner = item.food_partner if isinstance(item, OrderItem) else item.menu_item.food_partner
+        if partner:
+            demand[partner] += item.quantity
+    return dict(demand)
+
+
+def _order_demand(order):
+    return dict(
+        OrderItem.objects.filter(order=order).exclude(food_partner='')
+        .values_list('food_partner').annotate(items=Sum('quantity')).order_by()
+    )
+
+
+def _has_room(capacity, load_orders, load_items, items):
+    if capacity is None:
+        return True
+    if capacity.max_orders is not None and load_orders + 1 > capacity.max_orders:
+        return False
+    if capacity.max_items is not None and load_items + items > capacity.max_items:
+        return False
+    return True
+
+
+# ==================== RESERVATIONS ====================
+
+def reserve_slots(pickup_date, pickup_time, demand, enforce=True):
+    """Book an order's lines into each partner's slot (call inside its transaction)
+
+    Raises ``SlotFull`` when a partner has no room, which rolls the
+    surrounding transaction back. Partners without a capacity can't be
+    full, so their load rows are all written by one ``add_counts``
+    statement. A capped partner's row is only written by a conditional
+    UPDATE, so concurrent orders queue on that row and the capacity check
+    sees the committed count. Uncapped partners go first, then capped
+    ones, each in name order, to keep lock order consistent.
+    """
+    slot = slot_of(pickup_time)
+    capacities = {}
+    if enforce:
+        capacities = {
+            capacity.food_partner: capacity
+            for capacity in PickupSlotCapacity.objects.filter(food_partner__in=demand)
+        }
+
+    add_counts(PickupSlotLoad, ('food_partner', 'pickup_date', 'slot'), [
+        {'food_partner': partner, 'pickup_date': pickup_date, 'slot': slot, 'order_count': 1, 'item_count': demand[partner]}
+        for partner in sorted(demand) if partner not in capacities
+    ])
+
+    for partner in sorted(capacities):
+        items = demand[partner]
+        capacity = capacities[partner]
+        if not _has_room(capacity, 0, 0, items):
+            raise SlotFull(partner, pickup_date, slot)
+        key = {'food_partner': partner, 'pickup_date': pickup_date, 'slot': slot}
+        room = Q()
+        if capacity.max_orders is not None:
+            room &= Q(order_count__lt=capacity.max_orders)
+        if capacity.max_items is not None:
+            room &= Q(item_count__lte=capacity.max_items - items)
+        booked = PickupSlotLoad.objects.filter(room, **key)
+        deltas = {'order_count': F('order_count') + 1, 'item_count': F('item_count') + items}
+
+        if booked.update(**deltas):
+            continue
+        if PickupSlotLoad.objects.filter(**key).exists():
+            raise SlotFull(partner, pickup_date, slot)
+        try:
+            with transaction.atomic():
+                PickupSlotLoad.objects.create(order_count=1, item_count=items, **key)
+        except IntegrityError:
+            # Another order opened the slot first; book against its count
+            if not booked.update(**deltas):
+                raise SlotFull(partner, pickup_date, slot)
+
+
+def release_slots(order, demand=None):
+    """Give an order's bookings back to its partners' slots"""
+    demand = _order_demand(order) if demand is None else demand
+    slot = slot_of(order.pickup_time)
+    for partner in sorted(demand):
+        PickupSlotLoad.objects.filter(
+            food_partner=partner, pickup_date=order.pickup_date, slot=slot
+        ).update(order_count=F('order_count') - 1, item_count=F('item_count') - demand[partner])
+
+
+def record_slot_status_change(order, old_status):
+    """Release a cancelled order's slot, or rebook a reinstated one"""
+    if (old_status == 'cancelled') == (order.status == 'cancelled'):
+        return
+    if order.status == 'cancelled':
+        release_slots(order)
+    else:
+        # Staff reinstating an order shouldn't be refused for capacity
+        reserve_slots(order.pickup_date, order.pickup_time, _order_demand(order), enforce=False)
+
+
+def record_slot_edit(order, previous):
+    """Move an order's bookings after an edit to its status or pickup time
+
+    ``previous`` is the order as saved before the edit.
+    """
+    before = previous.status != 'cancelled' and (previous.pickup_date, slot_of(previous.pickup_time))
+    after = order.status != 'cancelled' and (order.pickup_date, slot_of(order.pickup_time))
+    if before == after:
+        return
+    demand = _order_demand(order)
+    if before:
+        release_slots(previous, demand)
+    if after:
+        reserve_slots(order.pickup_date, order.pickup_time, demand, enforce=False)
+
+
+# ==================== AVAILABILITY ====================
+
+def slot_availability(partners, start=None, count=12, demand=None):
+    """The next ``count`` slots from ``start`` with each partner's load and room
+
+    ``demand`` (``{partner: items}``, e.g. from a cart) is what has to fit
+    for a slot to count as available; by default one item per partner.
+    Reads only the load rows for those slots and the partners' capacities.
+    """
+    if start is not None and timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    start = timezone.localtime(start)
+    slots = upcoming_slots(start, min(count, MAX_SLOTS))
+    partners = sorted(set(partners))
+    demand = demand or {}
+
+    capacities = {
+        capacity.food_partner: capacity
+        for capacity in PickupSlotCapacity.objects.filter(food_partner__in=partners)
+    }
+    in_window = Q()
+    by_date = defaultdict(list)
+    for pickup_date, slot in slots:
+        by_date[pickup_date].append(slot)
+    for pickup_date, day_slots in by_date.items():
+        in_window |= Q(pickup_date=pickup_date, slot__gte=day_slots[0], slot__lte=day_slots[-1])
+    loads = {
+        (load.food_partner, load.pickup_date, load.slot): load
+        for load in PickupSlotLoad.objects.filter(in_window, food_partner__in=partners)
+    }
+
+    results = []
+    for pickup_date, slot in slots:
+        entries = []
+        for partner in partners:
+            capacity = capacities.get(partner)
+            load = loads.get((partner, pickup_date, slot))
+            orders = load.order_count if load else 0
+            items = load.item_count if load else 0
+            entries.append({
+                'food_partner': partner,
+                'orders': orders,
+                'items': items,
+                'max_orders': capacity.max_orders if capacity else None,
+                'max_items': capacity.max_items if capacity else None,
+                'available': _has_room(capacity, orders, items, demand.get(partner, 1)),
+            })
+        results.append({
+            'pickup_time': datetime.combine(pickup_date, slot).isoformat(timespec='minutes'),
+            'available': all(entry['available'] for entry in entries),
+            'partners': entries,
+        })
+    return results
+
+
+def cart_demand(session_id):
+    """``{food_partner: item_count}`` for a session's cart"""
+    return partner_demand(
+        CartItem.objects.filter(cart__session_id=session_id).select_related('menu_item')
+    )
+
+
+# ==================== FULL REBUILD ====================
+
+@transaction.atomic
+def rebuild_slot_loads(since=None):
+    """Recount slot loads of live orders from ``since`` (default today); returns rows"""
+    since = since or timezone.localdate()
+    rows = defaultdict(lambda: [set(), 0])
+    lines = OrderItem.objects.filter(
+        order__pickup_date__gte=since
+    ).exclude(order__status='cancelled').exclude(food_partner='').values_list(
+        'food_partner', 'order_id', 'order__pickup_date', 'order__pickup_time', 'quantity'
+    )
+    for partner, order_id, pickup_date, pickup_time, quantity in lines.iterator():
+        row = rows[(partner, pickup_date, slot_of(pickup_time))]
+        row[0].add(order_id)
+        row[1] += quantity
+
+    PickupSlotLoad.objects.filter(pickup_date__gte=since).delete()
+    PickupSlotLoad.objects.bulk_create([
+        PickupSlotLoad(
+            food_partner=partner, pickup_date=pickup_date, slot=slot,
+            order_count=len(order_ids), item_count=items,
+        )
+        for (partner, pickup_date, slot), (order_ids, items) in rows.items()
+    ])
+    return len(rows)
@@ -0,0 +1,130 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import DailySalesRollup, Order, OrderItem
+from .pagination import VALID_STATUSES, filter_orders, parse_statuses
+
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+CENTS = Decimal('0.01')
+
+
+def _money(value):
+    # SQLite hands sums back without a fixed scale
+    return str(Decimal(value or 0).quantize(CENTS))
+
+
+# ==================== DASHBOARD STATS ====================
+
+def _uses_rollup(params):
+    """The rollup holds whole days, so it can only answer day-granular filters"""
+    if params.get('pickup_date'):
+        return False
+    return all(
+        len(params[name]) == 10 and parse_date(params[name]) is not None
+        for name in ('since', 'until') if params.get(name)
+    )
+
+
+def _rollup_totals(params, partner_name):
+    """Status counts and sales by day read from DailySalesRollup, O(days)"""
+    # Rows emptied by status moves and deletes stay behind at zero; a day
+    # with no orders left isn't a sales day
+    rollups = DailySalesRollup.objects.filter(food_partner=partner_name or '', order_count__gt=0)
+    if params.get('since'):
+        rollups = rollups.filter(day__gte=parse_date(params['since']))
+    if params.get('until'):
+        rollups = rollups.filter(day__lte=parse_date(params['until']))
+    if params.get('status'):
+        rollups = rollups.filter(status__in=parse_statuses(params['status']))
+
+    counts = dict(
+        rollups.values('status')
+        .annotate(orders=Sum('order_count'))
+        .values_list('status', 'orders')
+    )
+    sales_by_day = (
+        rollups.values('day')
+        .annotate(sales=Sum('revenue'))
+        .order_by('day')
+    )
+    return counts, list(sales_by_day)
+
+
+def dashboard_stats(params, partner_name=None):
+    """Dashboard figures computed in the database
+
+    Status counts and sales by day come from the daily rollup whenever the
+    filters are whole days, and from a live aggregate over orders
+    otherwise. Today's sales (by pickup date) and the top product are
+    always live grouped queries. Without a partner, sales are order totals
+    including tips (what the dashboard has always shown); for a partner
+    they are that partner's line revenue only.
+    """
+    today = timezone.localdate()
+    orders = filter_orders(Order.objects.all(), params)
+
+    if partner_name:
+        rows = OrderItem.objects.filter(
+            food_partner=partner_name, order__in=orders
+        )
+        amount = ExpressionWrapper(F('price_at_purchase') * F('quantity'), output_field=MONEY)
+        count_field = 'order'
+        prefix = 'order__'
+        lines = rows
+    else:
+        rows = orders
+        amount = ExpressionWrapper(F('total_amount') + F('tip_amount'), output_field=MONEY)
+        count_field = 'id'
+        prefix = ''
+        lines = OrderItem.objects.filter(order__in=orders)
+
+    def order_count(**extra):
+        # Partner rows are lines, so several can belong to one order
+        return Count(count_field, distinct=bool(partner_name), **extra)
+
+    if _uses_rollup(params):
+        counts, sales_by_day = _rollup_totals(params, partner_name)
+        sales_today = rows.aggregate(
+            sales=Sum(amount, filter=Q(**{f'{prefix}pickup_date': today}))
+        )['sales']
+    else:
+        summary = rows.aggregate(
+            sales_today=Sum(amount, filter=Q(**{f'{prefix}pickup_date': today})),
+            **{
+                status: order_count(filter=Q(**{f'{prefix}status': status}))
+                for status in VALID_STATUSES
+            }
+        )
+        counts = {status: summary[status] for status in VALID_STATUSES}
+        sales_today = summary['sales_today']
+        sales_by_day = (
+            rows.annotate(day=TruncDate(f'{prefix}created_at'))
+            .values('day')
+            .annotate(sales=Sum(amount))
+            .order_by('day')
+        )
+
+    top_product = (
+        lines.values('item_name')
+        .annotate(quantity=Sum('quantity'))
+        .order_by('-quantity', 'item_name')
+        .first()
+    )
+
+    status_counts = {status: counts.get(status) or 0 for status in VALID_STATUSES}
+    return {
+        'partner': partner_name or None,
+        'total_orders': sum(status_counts.values()),
+        'status_counts': status_counts,
+        'sales_today': _money(sales_today),
+        'sales_by_day': [
+            {'date': row['day'].isoformat(), 'sales': _money(row['sales'])}
+            for row in sales_by_day
+        ],
+        'top_product': top_product['item_name'] if top_product else None,
+    }
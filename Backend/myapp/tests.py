@@ -0,0 +1,376 @@
+import json
+import logging
+import os
+from datetime import date, time
+from decimal import Decimal
+
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .carts import add_quantity, get_cached_cart
+from .hashers import ScryptPasswordHasher, verify_password
+from .log import NonBlockingHandler
+from .models import Cart, CartItem, MenuItem, Order, OrderItem, UserProfile
+from .rollups import record_order_created
+from .session_store import SessionStore
+
+
+def create_orders(count, session_id='sess-1'):
+    """``count`` orders with one line from each of two partners"""
+    menu_items = [
+        MenuItem.objects.create(name='Chickenjoy', price=Decimal('99.00'), food_partner='Jollibee'),
+        MenuItem.objects.create(name='Siomai rice', price=Decimal('75.00'), food_partner='Chowking'),
+    ]
+    orders = [
+        Order.objects.create(
+            session_id=session_id, total_amount=Decimal('174.00'), payment_method='cash',
+            pickup_date=date(2030, 1, 1), pickup_time=time(12, 0),
+        )
+        for _ in range(count)
+    ]
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order, menu_item=menu_item, quantity=1, price_at_purchase=menu_item.price,
+            food_partner=menu_item.food_partner, item_name=menu_item.name,
+        )
+        for order in orders for menu_item in menu_items
+    ])
+    return orders
+
+
+class OrderListQueryCountTests(TestCase):
+    """Order listings cost two queries (orders + lines) whatever their size"""
+
+    def assert_constant_queries(self, url, params):
+        for count in (5, 35):
+            with self.subTest(orders=count):
+                Order.objects.all().delete()
+                create_orders(count)
+                with self.assertNumQueries(2):
+                    response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['orders']), count)
+
+    def test_admin_orders(self):
+        self.assert_constant_queries('/api/admin/orders/', {})
+
+    def test_partner_orders(self):
+        self.assert_constant_queries('/api/partner/orders/', {'partner': 'Jollibee'})
+
+    def test_session_orders(self):
+        self.assert_constant_queries('/api/orders/', {'session_id': 'sess-1'})
+
+
+class CreateOrderQueryCountTests(TestCase):
+    """Placing an order costs the same queries whatever the number of partners"""
+
+    def place_order(self, session_id, partners):
+        cart = Cart.objects.create(session_id=session_id)
+        for partner in partners:
+            menu_item = MenuItem.objects.create(name=f'{partner} meal', price=Decimal('99.00'), food_partner=partner)
+            CartItem.objects.create(cart=cart, menu_item=menu_item, quantity=2)
+        # Cart, lines, capacities, slot upsert, order, order lines, rollup
+        # upsert, cart clear, plus the transaction's savepoint and release
+        with self.assertNumQueries(10):
+            response = self.client.post('/api/orders/create/', {
+                'session_id': session_id, 'payment_method': 'cash', 'pickup_time': '2030-01-01T12:00',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_one_partner(self):
+        self.place_order('sess-1', ['Jollibee'])
+        self.place_order('sess-2', ['Jollibee'])
+
+    def test_six_partners(self):
+        partners = [f'Partner {i}' for i in range(6)]
+        # New slot and rollup rows, then the same rows again
+        self.place_order('sess-1', partners)
+        self.place_order('sess-2', partners)
+
+
+class SalesRollupTests(TestCase):
+    """Rollup-backed stats agree with stats computed from the orders themselves"""
+
+    def setUp(self):
+        for order in create_orders(3):
+            record_order_created(order)
+
+    def assert_rollup_matches_orders(self):
+        for partner in ('', 'Jollibee'):
+            with self.subTest(partner=partner):
+                rolled_up = self.client.get('/api/admin/stats/', {'partner': partner}).json()
+                # A time of day in ?since= makes the stats read orders directly
+                live = self.client.get('/api/admin/stats/', {'partner': partner, 'since': '2020-01-01T00:00'}).json()
+                self.assertEqual(rolled_up['status_counts'], live['status_counts'])
+                self.assertEqual(rolled_up['sales_by_day'], live['sales_by_day'])
+
+    def test_delete(self):
+        Order.objects.first().delete()
+        self.assert_rollup_matches_orders()
+        Order.objects.all().delete()
+        self.assert_rollup_matches_orders()
+
+    def test_without_upsert(self):
+        # Backends without ON CONFLICT update the rollup rows one by one
+        with mock.patch.object(connection, 'vendor', 'other'):
+            for order in create_orders(2):
+                record_order_created(order)
+            Order.objects.first().delete()
+        self.assert_rollup_matches_orders()
+
+    def test_admin_edit(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        order = Order.objects.first()
+        response = self.client.post(f'/admin/myapp/order/{order.pk}/change/', {
+            'session_id': order.session_id, 'customer_name': '', 'total_amount': '180.00',
+            'tip_amount': '0', 'payment_method': 'cash', 'pickup_date': '2030-01-01',
+            'pickup_time': '12:00:00', 'status': 'cancelled',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'cancelled')
+        self.assert_rollup_matches_orders()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'reads SQLite EXPLAIN QUERY PLAN output')
+class LookupIndexTests(TestCase):
+    """The hot lookups are answered from their indexes, not table scans"""
+
+    @classmethod
+    def setUpTestData(cls):
+        partners = [f'Partner {i}' for i in range(8)]
+        MenuItem.objects.bulk_create([
+            MenuItem(name=f'Item {i}', price=Decimal('50.00'), food_partner=partners[i % 8], available=i % 3 > 0)
+            for i in range(160)
+        ])
+        statuses = ['pending', 'confirmed', 'preparing', 'ready', 'completed', 'cancelled']
+        Order.objects.bulk_create([
+            Order(
+                session_id=f'sess-{i % 50}', total_amount=Decimal('50.00'), payment_method='cash',
+                pickup_date=date(2030, 1, 1 + i % 28), pickup_time=time(12, 0), status=statuses[i % 6],
+            )
+            for i in range(600)
+        ])
+        Cart.objects.bulk_create([Cart(session_id=f'sess-{i}') for i in range(20)])
+        carts = list(Cart.objects.all())
+        menu_items = list(MenuItem.objects.all()[:10])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, menu_item=menu_item, quantity=1) for cart in carts for menu_item in menu_items
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assert_uses_index(self, queryset, index):
+        self.assertIn(f'INDEX {index} ', queryset.explain())
+
+    def test_session_orders(self):
+        self.assert_uses_index(
+            Order.objects.filter(session_id='sess-1').order_by('-created_at'), 'order_session_created_idx'
+        )
+
+    def test_status_and_pickup_date(self):
+        self.assert_uses_index(
+            Order.objects.filter(status='pending', pickup_date=date(2030, 1, 1)), 'order_status_pickup_idx'
+        )
+
+    def test_partner_menu(self):
+        self.assert_uses_index(
+            MenuItem.objects.filter(food_partner='Partner 1', available=True), 'menuitem_partner_avail_idx'
+        )
+
+    def test_cart_line(self):
+        # SQLite backs a plain UniqueConstraint with an automatic index, so
+        # check for a search on both of the constraint's columns
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, CartItem._meta.db_table)
+        self.assertEqual(constraints['unique_cart_menu_item']['columns'], ['cart_id', 'menu_item_id'])
+        cart_item = CartItem.objects.first()
+        plan = CartItem.objects.filter(cart_id=cart_item.cart_id, menu_item_id=cart_item.menu_item_id).explain()
+        self.assertRegex(plan, r'SEARCH myapp_cartitem USING (COVERING )?INDEX \S+ \(cart_id=\? AND menu_item_id=\?\)')
+
+
+class AddQuantityTests(TestCase):
+    """The upsert and its ORM fallback add to the same cart line"""
+
+    def setUp(self):
+        self.cart = Cart.objects.create(session_id='sess-1')
+        self.menu_item = MenuItem.objects.create(name='Chickenjoy', price=Decimal('99.00'), food_partner='Jollibee')
+
+    def assert_adds_up(self):
+        item_id, quantity = add_quantity(self.cart.id, self.menu_item.id, 2)
+        self.assertEqual(add_quantity(self.cart.id, self.menu_item.id, 3), (item_id, 5))
+        item = CartItem.objects.get()
+        self.assertEqual((item.id, item.quantity), (item_id, 5))
+        self.assertIsNotNone(item.added_at.tzinfo)
+
+    def test_upsert(self):
+        self.assert_adds_up()
+
+    def test_without_returning(self):
+        # e.g. SQLite older than 3.35
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.assert_adds_up()
+
+
+@override_settings(CART_CACHE_ENABLED=True)
+class CartCacheTests(TestCase):
+    """Cached cart payloads follow menu writes"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.menu_item = MenuItem.objects.create(name='Chickenjoy', price=Decimal('99.00'), food_partner='Jollibee')
+        CartItem.objects.create(cart=Cart.objects.create(session_id='sess-1'), menu_item=self.menu_item, quantity=2)
+        self.assertEqual(self.get_cart()['total'], '198.00')
+
+    def get_cart(self):
+        return self.client.get('/api/cart/', {'session_id': 'sess-1'}).json()
+
+    def test_price_change(self):
+        response = self.client.put(
+            f'/api/admin/menu/update/{self.menu_item.pk}/', {'price': '120.00'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        cart = self.get_cart()
+        self.assertEqual(cart['cart'][0]['price'], '120.00')
+        self.assertEqual(cart['total'], '240.00')
+
+    def test_cart_write(self):
+        self.assertIsNotNone(get_cached_cart('sess-1'))
+        response = self.client.post('/api/cart/add/', {
+            'session_id': 'sess-1', 'menu_item_id': self.menu_item.pk, 'quantity': 1,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['cart_total'], response.json()['cart_items']), ('297.00', 3))
+        # Writers drop the cached copy; the next read fills it
+        self.assertIsNone(get_cached_cart('sess-1'))
+        self.assertEqual(self.get_cart()['total'], '297.00')
+        self.assertEqual(get_cached_cart('sess-1')['total'], '297.00')
+
+    def test_menu_item_deleted(self):
+        self.assertEqual(self.client.delete(f'/api/admin/menu/delete/{self.menu_item.pk}/').status_code, 200)
+        self.assertEqual(self.get_cart(), {'cart': [], 'total': '0.00', 'item_count': 0})
+
+
+class FailSoftSessionTests(TestCase):
+    """The cached session store loads asynchronously, with and without its cache"""
+
+    def setUp(self):
+        caches['default'].clear()
+        session = SessionStore()
+        session['cart_session_id'] = 'sess-1'
+        session.save()
+        self.session_key = session.session_key
+
+    async def test_async_load(self):
+        session = SessionStore(self.session_key)
+        self.assertEqual(await session.aget('cart_session_id'), 'sess-1')
+        self.assertTrue(await caches['default'].ahas_key(await session.acache_key()))
+
+    async def test_async_load_with_cache_down(self):
+        cache_class = type(caches['default'])
+        with mock.patch.object(cache_class, 'get', side_effect=ConnectionError), \
+                mock.patch.object(cache_class, 'set', side_effect=ConnectionError):
+            session = SessionStore(self.session_key)
+            self.assertEqual(await session.aget('cart_session_id'), 'sess-1')
+            await session.aset('cart_session_id', 'sess-2')
+            await session.asave()
+        # The failed cache write dropped the stale copy instead of leaving it
+        self.assertEqual((await SessionStore(self.session_key).aload())['cart_session_id'], 'sess-2')
+
+
+class IdempotentOrderTests(TestCase):
+    """A reused Idempotency-Key is logged as a replay only when the body matches"""
+
+    def setUp(self):
+        menu_item = MenuItem.objects.create(name='Chickenjoy', price=Decimal('99.00'), food_partner='Jollibee')
+        CartItem.objects.create(cart=Cart.objects.create(session_id='sess-1'), menu_item=menu_item, quantity=1)
+
+    def create_order(self, payment_method='cash'):
+        return self.client.post('/api/orders/create/', {
+            'session_id': 'sess-1', 'payment_method': payment_method, 'pickup_time': '2030-01-01T12:00',
+        }, content_type='application/json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+    def test_replay_and_mismatch_logging(self):
+        self.assertEqual(self.create_order().status_code, 201)
+        with self.assertLogs('myapp.idempotency', 'INFO') as logs:
+            self.assertEqual(self.create_order()['Idempotent-Replayed'], 'true')
+            self.assertEqual(self.create_order(payment_method='gcash').status_code, 422)
+        self.assertEqual([(record.levelname, record.getMessage()) for record in logs.records], [
+            ('INFO', 'Replaying stored response'),
+            ('WARNING', 'Idempotency-Key reused for a different request'),
+        ])
+
+
+@override_settings(PASSWORD_REHASH_IN_BACKGROUND=False)
+class PasswordUpgradeTests(TestCase):
+    """Logins upgrade cheaper hashes and keep costlier ones"""
+
+    def login_with_hash(self, hasher, iterations):
+        user = User.objects.create_user('member')
+        user.password = hasher.encode('pw', hasher.salt(), iterations)
+        user.save(update_fields=['password'])
+        self.assertTrue(verify_password(user, 'pw'))
+        user.refresh_from_db()
+        return hasher.decode(user.password)['iterations']
+
+    def test_stronger_hash_kept(self):
+        self.assertEqual(self.login_with_hash(hashers.PBKDF2PasswordHasher(), 1_000_000), 1_000_000)
+
+    def test_weaker_hash_upgraded(self):
+        self.assertEqual(
+            self.login_with_hash(hashers.PBKDF2PasswordHasher(), 1_000),
+            settings.PASSWORD_HASHER_PARAMS['pbkdf2']['iterations'],
+        )
+
+    def test_scrypt_parameters(self):
+        hasher = ScryptPasswordHasher()
+        self.assertFalse(hasher.must_update(hasher.encode('pw', hasher.salt())))
+        other = hashers.ScryptPasswordHasher()
+        other.parallelism = hasher.parallelism + 1
+        self.assertFalse(hasher.must_update(other.encode('pw', other.salt())))
+        other.parallelism = hasher.parallelism - 1
+        self.assertTrue(hasher.must_update(other.encode('pw', other.salt())))
+
+
+@skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+class NonBlockingHandlerTests(SimpleTestCase):
+    """A worker forked after logging started still gets its records written"""
+
+    def test_forked_child(self):
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(write_fd, 'w') as stream:
+            handler = NonBlockingHandler(stream)
+            handler.handle(logging.makeLogRecord({'msg': 'parent'}))
+            pid = os.fork()
+            if pid == 0:
+                # The parent's listener thread didn't survive the fork
+                handler.handle(logging.makeLogRecord({'msg': 'child'}))
+                handler._stop_listener()
+                os._exit(0)
+            os.waitpid(pid, 0)
+            handler._stop_listener()
+        with os.fdopen(read_fd) as lines:
+            self.assertEqual(sorted(json.loads(line)['message'] for line in lines), ['child', 'parent'])
+
+
+class OrderEventAccessTests(TestCase):
+    """The stream of every order's events needs an admin login"""
+
+    def test_unfiltered_stream_refused(self):
+        self.assertEqual(self.client.get('/api/orders/events/').status_code, 403)
+        member = User.objects.create_user('member', password='pw')
+        UserProfile.objects.create(user=member, role='member')
+        self.client.force_login(member)
+        self.assertEqual(self.client.get('/api/orders/events/').status_code, 403)
+
+    def test_refused_under_wsgi(self):
+        # The test client goes through the WSGI handler, which would never
+        # finish reading the stream
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.assertEqual(self.client.get('/api/orders/events/').status_code, 503)
+        self.assertEqual(self.client.get('/api/orders/events/', {'partner': 'Jollibee'}).status_code, 503)
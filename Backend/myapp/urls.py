@@ -11,6 +11,7 @@ urlpatterns = [
     
     # Menu endpoints
     path('menu/', views.get_menu_items, name='get_menu_items'),
+    path('menu/search/', views.search_menu_items, name='search_menu_items'),
     
     # Cart endpoints
     path('cart/', views.get_cart, name='get_cart'),
@@ -18,10 +19,12 @@ urlpatterns = [
     path('cart/update/<int:item_id>/', views.update_cart_item, name='update_cart_item'),
     path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('cart/remove-by-item/', views.remove_from_cart_by_menu_item, name='remove_cart_by_menu'),
+    path('cart/batch/', views.batch_update_cart, name='batch_update_cart'),
     
     # Order endpoints
     path('orders/create/', views.create_order, name='create_order'),
     path('orders/', views.get_orders, name='get_orders'),
+    path('orders/pickup-slots/', views.get_pickup_slots, name='get_pickup_slots'),
     
     # Favorites endpoints
     path('favorites/', views.get_favorites, name='get_favorites'),
@@ -34,8 +37,11 @@ urlpatterns = [
     path('admin/menu/create/', views.create_menu_item, name='create_menu_item'),
     path('admin/menu/update/<int:item_id>/', views.update_menu_item, name='update_menu_item'),
     path('admin/menu/delete/<int:item_id>/', views.delete_menu_item, name='delete_menu_item'),
+    path('admin/menu/import/', views.import_menu_items, name='import_menu_items'),
+    path('admin/menu/export/', views.export_menu_items, name='export_menu_items'),
     path('admin/orders/', views.get_all_orders_admin, name='admin_get_all_orders'),
     path('admin/orders/<int:order_id>/status/', views.update_order_status, name='admin_update_order_status'),
+    path('admin/stats/', views.get_admin_stats, name='admin_stats'),
     
     # Food Partners endpoints
     path('partners/', views.get_food_partners, name='get_food_partners'),
@@ -45,6 +51,7 @@ urlpatterns = [
     path('partner/orders/', views.get_partner_orders, name='partner_orders'),
     path('partner/orders/<int:order_id>/status/', views.update_partner_order_status, name='partner_update_status'),
     path('orders/cancel/<int:order_id>/', CancelOrderView.as_view(), name='cancel_order'),
+    path('orders/events/', views.order_events, name='order_events'),
     
     path('create-users/', views.create_users, name='create_users'),
 ]
\ No newline at end of file
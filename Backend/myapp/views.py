@@ -1,12 +1,40 @@
+import io
+import logging
+
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse
-from django.contrib.auth import authenticate, login, logout
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
 from django.views.decorators.http import require_http_methods
-from django.db.models import F, Sum
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 import json
-from .models import MenuItem, Cart, CartItem, Order, OrderItem, Favorite
+from .models import MenuItem, Cart, CartItem, Order, OrderItem, Favorite, Food_Partners
+from .serializers import (
+    MENU_ITEM_FIELDS, compact_orders, menu_item_rows, menu_items_payload, order_fields,
+    order_queryset, serialize_order, serialize_partner_order,
+)
+from .projection import is_compact, parse_fields
+from .renderers import JsonResponse
+from .pagination import list_orders, order_changes, wants_changes
+from .stats import dashboard_stats
+from .rollups import record_order_created, record_status_change
+from .menu_cache import bump_menu_version, cached_menu_response
+from .carts import (
+    add_quantity, apply_cart_operations, cart_payload, empty_cart_payload,
+    forget_cart, get_cached_cart, parse_cart_operations, refresh_cart, refresh_cart_totals, store_cart,
+)
+from .idempotency import IDEMPOTENCY_HEADER, find_replay, remember_response, request_fingerprint
+from .hashers import verify_password
+from .events import can_stream_all, event_filter, order_partners, publish_order_event, stream_events
+from .menu_sync import MENU_FORMATS, export_menu, format_for, import_menu, read_menu_rows, text_stream
+from .search import AVAILABILITY, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, MAX_SEARCH_OFFSET, search_menu
+from .slots import SlotFull, cart_demand, partner_demand, record_slot_status_change, reserve_slots, slot_availability
 from datetime import datetime
+from decimal import Decimal
 from urllib.parse import unquote
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -14,17 +42,16 @@ from django.views import View
 from datetime import timedelta
 from django.utils import timezone
 from .models import UserProfile
-from django.contrib.auth.hashers import check_password
 from django.core.management import call_command
 
 from django.contrib.auth.models import User
 from myapp.models import UserProfile
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
 
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
 
 @csrf_exempt
 def create_users(request):
@@ -76,6 +103,20 @@ def create_users(request):
 
 # ==================== AUTHENTICATION VIEWS ====================
 
+def _signup_conflict(username, email, sr_code):
+    """Error body for the first signup field already taken, or None"""
+    taken = list(User.objects.filter(
+        Q(username=username) | Q(email=email) | Q(profile__sr_code=sr_code)
+    ).values_list('username', 'email', 'profile__sr_code'))
+    if any(row[0] == username for row in taken):
+        return {'error': 'Username already exists', 'field': 'username'}
+    if any(row[1] == email for row in taken):
+        return {'error': 'Email already exists', 'field': 'email'}
+    if any(row[2] == sr_code for row in taken):
+        return {'error': 'SR Code already registered', 'field': 'sr_code'}
+    return None
+
+
 @csrf_exempt  # Add this line
 @require_http_methods(["POST"])
 def signup_view(request):
@@ -94,33 +135,32 @@ def signup_view(request):
         if not all([username, email, password, full_name, sr_code]):
             return JsonResponse({'error': 'All fields required'}, status=400)
         
-        # Check if user exists
-        if User.objects.filter(username=username).exists():
-            return JsonResponse({'error': 'Username already exists'}, status=400)
-        
-        if User.objects.filter(email=email).exists():
-            return JsonResponse({'error': 'Email already exists'}, status=400)
-        
-        # Check if SR code already exists
+        # Check username, email and SR code in one query
+        conflict = _signup_conflict(username, email, sr_code)
+        if conflict:
+            return JsonResponse(conflict, status=400)
         
-        if UserProfile.objects.filter(sr_code=sr_code).exists():
-            return JsonResponse({'error': 'SR Code already registered'}, status=400)
-        
-        # Create user
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            password=password
-        )
-        
-        # Create profile
-        profile = UserProfile.objects.create(
-            user=user,
-            role=role,
-            food_partner=food_partner if role == 'staff' else '',
-            full_name=full_name,
-            sr_code=sr_code
-        )
+        # Create user and profile together; the unique constraints catch a
+        # concurrent signup that passed the check above
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=username,
+                    email=email,
+                    password=password
+                )
+                profile = UserProfile.objects.create(
+                    user=user,
+                    role=role,
+                    food_partner=food_partner if role == 'staff' else '',
+                    full_name=full_name,
+                    sr_code=sr_code
+                )
+        except IntegrityError:
+            conflict = _signup_conflict(username, email, sr_code)
+            if not conflict:
+                raise
+            return JsonResponse(conflict, status=400)
  
         # Log the user in (creates session)
         login(request, user)
@@ -140,9 +180,7 @@ def signup_view(request):
         }, status=201)
         
     except Exception as e:
-        print(f"Signup error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Signup error')
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -153,84 +191,55 @@ def signup_view(request):
 def login_view(request):
     """User login"""
     try:
-        print("=" * 50)
-        print("LOGIN VIEW CALLED")
-        print(f"Method: {request.method}")
-        print(f"Path: {request.path}")
-        print("=" * 50)
-        
         data = json.loads(request.body)
         username = data.get('username')
         password = data.get('password')
         
-        print(f"Username: {username}")
-        print(f"Password length: {len(password) if password else 0}")
+        logger.debug('Login attempt', extra={'username': username})
         
         if not all([username, password]):
             return JsonResponse({'error': 'Username and password required'}, status=400)
         
-        # Check if user exists first
-        from django.contrib.auth.models import User
-        try:
-            user_obj = User.objects.get(username=username)
-            print(f"✅ User exists: ID={user_obj.id}, username={user_obj.username}")
-            print(f"✅ User is_active: {user_obj.is_active}")
-            print(f"✅ Password hash (first 50): {user_obj.password[:50]}")
-        except User.DoesNotExist:
-            print(f"❌ User '{username}' does not exist in database")
+        # One query for the user and profile, one hash check
+        user = User.objects.select_related('profile').filter(username=username).first()
+        if user is None:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            User().set_password(password)
+            logger.info('Login failed: unknown user', extra={'username': username})
             return JsonResponse({'error': 'Invalid credentials'}, status=401)
         
-        # Try to authenticate
-        print("Attempting authentication...")
-        user = authenticate(request, username=username, password=password)
+        if not verify_password(user, password) or not user.is_active:
+            logger.info('Login failed: credentials did not match', extra={'user_id': user.id})
+            return JsonResponse({'error': 'Invalid credentials'}, status=401)
         
-        if user is not None:
-            print(f"✅ Authentication successful!")
-            print(f"✅ Authenticated user: {user.username} (ID: {user.id})")
-            
-            # Login creates the session
-            login(request, user)
-            
-            # Get user profile
-            try:
-                profile = user.profile
-                print(f"✅ Profile found: role={profile.role}")
-            except Exception as e:
-                print(f"⚠️ Profile error: {e}")
-                profile = None
-            
-            response_data = {
-                'success': True,
-                'message': 'Login successful',
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'role': profile.role if profile else 'member',
-                    'food_partner': profile.food_partner if profile else '',
-                    'full_name': getattr(profile, 'full_name', '') if profile else '',
-                    'sr_code': getattr(profile, 'sr_code', '') if profile else '',
-                }
+        logger.info('Login succeeded', extra={'user_id': user.id})
+        
+        # Login creates the session; the password is already verified, so
+        # skip authenticate() and its second lookup and hash
+        login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+        
+        try:
+            profile = user.profile
+        except UserProfile.DoesNotExist:
+            logger.warning('User has no profile', extra={'user_id': user.id})
+            profile = None
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Login successful',
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'role': profile.role if profile else 'member',
+                'food_partner': profile.food_partner if profile else '',
+                'full_name': profile.full_name if profile else '',
+                'sr_code': profile.sr_code if profile else '',
             }
-            
-            print(f"✅ Sending success response")
-            return JsonResponse(response_data)
-            
-        else:
-            print(f"❌ authenticate() returned None")
-            print(f"❌ Credentials did not match")
-            
-            # Manual check - does the password match?
-            
-            manual_check = check_password(password, user_obj.password)
-            print(f"Manual password check: {manual_check}")
-            
-            return JsonResponse({'error': 'Invalid credentials'}, status=401)
+        })
             
     except Exception as e:
-        print(f"❌ Login exception: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Login error')
         return JsonResponse({'error': str(e)}, status=500)
 @require_http_methods(["POST"])
 def logout_view(request):
@@ -285,19 +294,49 @@ def check_auth(request):
 # ==================== MENU VIEWS ====================
 
 def get_menu_items(request):
-    """Get all available menu items (public)"""
-    items = MenuItem.objects.all()  # Changed from filter(available=True)
-    data = [{
-        'id': item.id,
-        'name': item.name,
-        'description': item.description,
-        'price': str(item.price),
-        'image_url': item.image_url,
-        'category': item.category,
-        'food_partner': item.food_partner,
-        'available': item.available,  # Added this field so frontend knows status
-    } for item in items]
-    return JsonResponse({'items': data})
+    """Get all menu items (public, cached until the menu changes; ?fields=, ?format=compact)"""
+    try:
+        fields = parse_fields(request.GET.get('fields'), MENU_ITEM_FIELDS)
+        compact = is_compact(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    def build():
+        # All items, unavailable ones included so the frontend knows their status
+        rows = menu_item_rows(MenuItem.objects.all(), fields)
+        return menu_items_payload(rows, fields, compact)
+    return cached_menu_response(request, f'all:{",".join(fields)}:{compact}', build)
+
+@require_http_methods(["GET"])
+def search_menu_items(request):
+    """Ranked menu search (?q=, available=true|false|all, partner, category, limit, offset)"""
+    try:
+        query = request.GET.get('q', '').strip()
+        available = request.GET.get('available', 'true')
+        if available not in AVAILABILITY:
+            return JsonResponse({'error': 'available must be true, false or all'}, status=400)
+        try:
+            limit = int(request.GET.get('limit', DEFAULT_SEARCH_LIMIT))
+            offset = int(request.GET.get('offset', 0))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid limit or offset'}, status=400)
+        limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+        offset = max(0, min(offset, MAX_SEARCH_OFFSET))
+        partner = request.GET.get('partner', '')
+        category = request.GET.get('category', '')
+        
+        def build():
+            items, next_offset = search_menu(
+                query, AVAILABILITY[available], partner, category, limit, offset
+            )
+            return {'query': query, 'items': items, 'next_offset': next_offset}
+        
+        # Results are cached per query until the next menu write
+        key = json.dumps([query.lower(), available, partner, category, limit, offset])
+        return cached_menu_response(request, f'search:{key}', build)
+    except Exception as e:
+        logger.exception('Error searching menu')
+        return JsonResponse({'error': str(e)}, status=500)
 
 def get_all_menu_items_admin(request):
     """Get all menu items including unavailable (admin)"""
@@ -329,6 +368,7 @@ def create_menu_item(request):
             food_partner=data.get('food_partner', ''),
             available=data.get('available', True)
         )
+        bump_menu_version()
         return JsonResponse({
             'message': 'Menu item created successfully',
             'item': {
@@ -359,6 +399,7 @@ def update_menu_item(request, item_id):
         menu_item.food_partner = data.get('food_partner', menu_item.food_partner)
         menu_item.available = data.get('available', menu_item.available)
         menu_item.save()
+        bump_menu_version()
         return JsonResponse({
             'message': 'Menu item updated successfully',
             'item': {
@@ -392,14 +433,15 @@ def delete_menu_item(request, item_id):
         
         # Delete related cart items first (manual cascade)
         cart_items_deleted = CartItem.objects.filter(menu_item=menu_item).delete()[0]
-        print(f"Deleted {cart_items_deleted} cart items for menu item {item_id}")
+        logger.debug('Deleted %d cart items for menu item %s', cart_items_deleted, item_id)
         
         # Delete related favorites
         favorites_deleted = Favorite.objects.filter(menu_item=menu_item).delete()[0]
-        print(f"Deleted {favorites_deleted} favorites for menu item {item_id}")
+        logger.debug('Deleted %d favorites for menu item %s', favorites_deleted, item_id)
         
         # Now safe to delete the menu item
         menu_item.delete()
+        bump_menu_version()
         
         return JsonResponse({
             'success': True,
@@ -409,11 +451,51 @@ def delete_menu_item(request, item_id):
     except MenuItem.DoesNotExist:
         return JsonResponse({'error': 'Menu item not found'}, status=404)
     except Exception as e:
-        print(f"Error deleting menu item: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error deleting menu item')
         return JsonResponse({'error': str(e)}, status=500)
 
+@require_http_methods(["POST"])
+def import_menu_items(request):
+    """Create/update menu items from an uploaded CSV or JSON menu file (admin)"""
+    try:
+        # A multipart upload in `file`, or the file as the raw body
+        upload = request.FILES.get('file')
+        if upload is not None:
+            binary, name = upload, upload.name
+        else:
+            binary, name = io.BytesIO(request.body), ''
+        default = 'json' if request.content_type == 'application/json' else 'csv'
+        fmt = request.GET.get('format') or format_for(name, default)
+        if fmt not in MENU_FORMATS:
+            return JsonResponse({'error': f'format must be one of {", ".join(MENU_FORMATS)}'}, status=400)
+        
+        summary = import_menu(
+            read_menu_rows(text_stream(binary), fmt),
+            food_partner=request.GET.get('partner') or None,
+            prune=request.GET.get('prune') in ('1', 'true'),
+            dry_run=request.GET.get('dry_run') in ('1', 'true'),
+        )
+        logger.info('Menu imported', extra={'import_summary': summary})
+        return JsonResponse({'success': True, **summary})
+    except (ValueError, UnicodeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.exception('Error importing menu')
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_http_methods(["GET"])
+def export_menu_items(request):
+    """Download the menu as CSV or JSON, ready to import again (admin)"""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in MENU_FORMATS:
+        return JsonResponse({'error': f'format must be one of {", ".join(MENU_FORMATS)}'}, status=400)
+    content_type = 'text/csv' if fmt == 'csv' else 'application/json'
+    response = StreamingHttpResponse(
+        export_menu(fmt, request.GET.get('partner')), content_type=f'{content_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="menu.{fmt}"'
+    return response
+
 # ==================== CART VIEWS ====================
 
 def get_cart(request):
@@ -421,38 +503,18 @@ def get_cart(request):
     try:
         session_id = request.GET.get('session_id')
         if not session_id:
-            return JsonResponse({'cart': [], 'total': '0.00', 'item_count': 0})
+            return JsonResponse(empty_cart_payload())
         
-        # Get or create cart for this session
-        cart = Cart.objects.filter(session_id=session_id).first()
-        
-        if not cart:
-            return JsonResponse({'cart': [], 'total': '0.00', 'item_count': 0})
-        
-        # Get all cart items with related menu items
-        cart_items = CartItem.objects.filter(cart=cart).select_related('menu_item')
-        
-        items_data = []
-        for item in cart_items:
-            items_data.append({
-                'id': item.id,
-                'menu_item_id': item.menu_item.id,
-                'name': item.menu_item.name,
-                'description': item.menu_item.description,
-                'price': str(item.menu_item.price),
-                'image_url': item.menu_item.image_url,
-                'category': item.menu_item.category,
-                'quantity': item.quantity,
-                'subtotal': str(item.subtotal)
-            })
+        # Hot carts are served from the cache; the database is the fallback
+        payload = get_cached_cart(session_id)
+        if payload is None:
+            cart = Cart.objects.filter(session_id=session_id).first()
+            payload = cart_payload(cart) if cart else empty_cart_payload()
+            store_cart(session_id, payload)
         
-        return JsonResponse({
-            'cart': items_data,
-            'total': str(cart.total_price),
-            'item_count': cart.total_items
-        })
+        return JsonResponse(payload)
     except Exception as e:
-        print(f"Error getting cart: {str(e)}")
+        logger.exception('Error getting cart')
         return JsonResponse({'error': str(e)}, status=500)
 
 @require_http_methods(["POST"])
@@ -464,7 +526,7 @@ def add_to_cart(request):
         quantity = data.get('quantity', 1)
         session_id = data.get('session_id')
         
-        print(f"Add to cart request: menu_item_id={menu_item_id}, quantity={quantity}, session_id={session_id}")
+        logger.debug('Add to cart', extra={'menu_item_id': menu_item_id, 'quantity': quantity, 'session_id': session_id})
         
         if not session_id:
             return JsonResponse({'error': 'Session ID required'}, status=400)
@@ -472,43 +534,32 @@ def add_to_cart(request):
         if not menu_item_id:
             return JsonResponse({'error': 'Menu item ID required'}, status=400)
         
-        # Get or create cart for this session
-        cart, created = Cart.objects.get_or_create(session_id=session_id)
-        print(f"Cart {'created' if created else 'found'}: {cart.id}")
+        if not isinstance(quantity, int) or quantity < 1:
+            return JsonResponse({'error': 'Invalid quantity'}, status=400)
         
-        # Get the menu item
-        try:
-            menu_item = MenuItem.objects.get(id=menu_item_id, available=True)
-        except MenuItem.DoesNotExist:
+        # Check the menu item
+        if not MenuItem.objects.filter(id=menu_item_id, available=True).exists():
             return JsonResponse({'error': 'Menu item not found or unavailable'}, status=404)
         
-        # Get or create cart item
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            menu_item=menu_item,
-            defaults={'quantity': quantity}
-        )
+        # Get or create cart for this session (session_id is unique, so
+        # concurrent first adds end up sharing one cart)
+        cart, created = Cart.objects.get_or_create(session_id=session_id)
         
-        if not created:
-            # Item already exists, increase quantity
-            cart_item.quantity += quantity
-            cart_item.save()
-            print(f"Updated existing cart item. New quantity: {cart_item.quantity}")
-        else:
-            print(f"Created new cart item with quantity: {cart_item.quantity}")
+        # Insert the line or add to its quantity in one statement
+        cart_item_id, new_quantity = add_quantity(cart.id, menu_item_id, quantity)
+        logger.debug('Cart item %s quantity is now %d', cart_item_id, new_quantity, extra={'cart_id': cart.id})
         
+        totals = refresh_cart_totals(cart)
         return JsonResponse({
             'success': True,
             'message': 'Added to cart successfully',
-            'cart_item_id': cart_item.id,
-            'quantity': cart_item.quantity,
-            'cart_total': str(cart.total_price),
-            'cart_items': cart.total_items
+            'cart_item_id': cart_item_id,
+            'quantity': new_quantity,
+            'cart_total': str(totals['total_price']),
+            'cart_items': totals['total_items']
         })
     except Exception as e:
-        print(f"Error in add_to_cart: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error in add_to_cart')
         return JsonResponse({'error': str(e)}, status=500)
 
 @require_http_methods(["PUT"])
@@ -518,44 +569,45 @@ def update_cart_item(request, item_id):
         data = json.loads(request.body)
         quantity = data.get('quantity')
         
-        if quantity is None or quantity < 1:
+        if not isinstance(quantity, int) or quantity < 1:
             return JsonResponse({'error': 'Invalid quantity'}, status=400)
         
-        cart_item = CartItem.objects.get(id=item_id)
+        cart_item = CartItem.objects.select_related('menu_item', 'cart').get(id=item_id)
         cart_item.quantity = quantity
-        cart_item.save()
+        cart_item.save(update_fields=['quantity'])
         
         return JsonResponse({
             'success': True,
             'message': 'Cart item updated successfully',
             'quantity': cart_item.quantity,
             'subtotal': str(cart_item.subtotal),
-            'cart_total': str(cart_item.cart.total_price)
+            'cart_total': str(refresh_cart_totals(cart_item.cart)['total_price'])
         })
     except CartItem.DoesNotExist:
         return JsonResponse({'error': 'Cart item not found'}, status=404)
     except Exception as e:
-        print(f"Error updating cart item: {str(e)}")
+        logger.exception('Error updating cart item')
         return JsonResponse({'error': str(e)}, status=500)
 
 @require_http_methods(["DELETE"])
 def remove_from_cart(request, item_id):
     """Remove an item from the cart"""
     try:
-        cart_item = CartItem.objects.get(id=item_id)
+        cart_item = CartItem.objects.select_related('cart').get(id=item_id)
         cart = cart_item.cart
         cart_item.delete()
         
+        totals = refresh_cart_totals(cart)
         return JsonResponse({
             'success': True,
             'message': 'Item removed from cart successfully',
-            'cart_total': str(cart.total_price),
-            'cart_items': cart.total_items
+            'cart_total': str(totals['total_price']),
+            'cart_items': totals['total_items']
         })
     except CartItem.DoesNotExist:
         return JsonResponse({'error': 'Cart item not found'}, status=404)
     except Exception as e:
-        print(f"Error removing from cart: {str(e)}")
+        logger.exception('Error removing from cart')
         return JsonResponse({'error': str(e)}, status=500)
 
 @require_http_methods(["DELETE"])
@@ -578,14 +630,49 @@ def remove_from_cart_by_menu_item(request):
             
         cart_item.delete()
         
+        totals = refresh_cart_totals(cart)
         return JsonResponse({
             'success': True,
             'message': 'Item removed from cart',
-            'cart_total': str(cart.total_price),
-            'cart_items': cart.total_items
+            'cart_total': str(totals['total_price']),
+            'cart_items': totals['total_items']
         })
     except Exception as e:
-        print(f"Error removing from cart: {str(e)}")
+        logger.exception('Error removing from cart')
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_http_methods(["POST"])
+def batch_update_cart(request):
+    """Apply a list of add/set/remove operations to one cart"""
+    try:
+        data = json.loads(request.body)
+        session_id = data.get('session_id')
+        
+        if not session_id:
+            return JsonResponse({'error': 'Session ID required'}, status=400)
+        
+        operations = parse_cart_operations(data.get('operations'))
+        
+        # Every add/set must point at an available menu item
+        wanted = {op['menu_item_id'] for op in operations if op['op'] != 'remove'}
+        found = set(MenuItem.objects.filter(id__in=wanted, available=True).values_list('id', flat=True))
+        missing = sorted(wanted - found)
+        if missing:
+            return JsonResponse({
+                'error': 'Menu item not found or unavailable',
+                'menu_item_ids': missing
+            }, status=404)
+        
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(session_id=session_id)
+            cart = Cart.objects.select_for_update().get(id=cart.id)
+            apply_cart_operations(cart, operations)
+        
+        return JsonResponse(refresh_cart(cart))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.exception('Error in batch_update_cart')
         return JsonResponse({'error': str(e)}, status=500)
 
 # ==================== ORDER VIEWS ====================
@@ -594,43 +681,26 @@ def remove_from_cart_by_menu_item(request):
 def create_order(request):
     """Create a new order from cart"""
     try:
-        print("=" * 50)
-        print("CREATE ORDER REQUEST RECEIVED")
-        print("=" * 50)
-        
         data = json.loads(request.body)
-        print(f"Request data: {data}")
         
         session_id = data.get('session_id')
         payment_method = data.get('payment_method')
-        tip_amount = data.get('tip', 0)
+        tip_amount = Decimal(str(data.get('tip') or 0))
         pickup_datetime = data.get('pickup_time')
         customer_name = data.get('customer_name', '')
         
-        print(f"Session ID: {session_id}")
-        print(f"Customer Name: {customer_name}")
-        print(f"Payment: {payment_method}")
-        print(f"Tip: {tip_amount}")
-        print(f"Pickup: {pickup_datetime}")
+        logger.debug('Create order', extra={
+            'session_id': session_id, 'payment_method': payment_method,
+            'tip': str(tip_amount), 'pickup_time': pickup_datetime,
+        })
         
         if not all([session_id, payment_method, pickup_datetime]):
-            print("ERROR: Missing required fields")
             return JsonResponse({'error': 'Missing required fields'}, status=400)
         
-        # Get cart
-        cart = Cart.objects.filter(session_id=session_id).first()
-        print(f"Cart found: {cart}")
-        
-        if not cart:
-            print("ERROR: Cart not found")
-            return JsonResponse({'error': 'Cart not found'}, status=400)
-            
-        cart_items = cart.items.all()
-        print(f"Cart items count: {cart_items.count()}")
-        
-        if cart_items.count() == 0:
-            print("ERROR: Cart is empty")
-            return JsonResponse({'error': 'Cart is empty'}, status=400)
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key and len(idempotency_key) > 255:
+            return JsonResponse({'error': 'Idempotency-Key too long'}, status=400)
+        fingerprint = request_fingerprint(request) if idempotency_key else None
         
         # Parse pickup datetime
         try:
@@ -638,57 +708,115 @@ def create_order(request):
         except:
             pickup_dt = datetime.strptime(pickup_datetime, '%Y-%m-%dT%H:%M')
         
-        print(f"Parsed pickup datetime: {pickup_dt}")
-        
-        # Create order
-        order = Order.objects.create(
-            session_id=session_id,
-            customer_name=customer_name,
-            total_amount=cart.total_price,
-            tip_amount=tip_amount,
-            payment_method=payment_method,
-            pickup_date=pickup_dt.date(),
-            pickup_time=pickup_dt.time(),
-            status='pending'
-        )
-        print(f"✅ Order created: #{order.id}")
-        
-        # Create order items from cart
-        for cart_item in cart_items:
-            order_item = OrderItem.objects.create(
-                order=order,
-                menu_item=cart_item.menu_item,
-                quantity=cart_item.quantity,
-                price_at_purchase=cart_item.menu_item.price
+        # Lock the cart so a double-submit waits here and then finds it empty;
+        # the order, its lines, the rollup and the cart clear commit together
+        with transaction.atomic():
+            cart = Cart.objects.select_for_update().filter(session_id=session_id).first()
+            
+            # A retry carrying the same Idempotency-Key gets the first response
+            if idempotency_key:
+                replay = find_replay(idempotency_key, fingerprint)
+                if replay is not None:
+                    return replay
+            
+            if not cart:
+                return JsonResponse({'error': 'Cart not found'}, status=400)
+            
+            cart_items = list(cart.items.select_related('menu_item'))
+            
+            if not cart_items:
+                return JsonResponse({'error': 'Cart is empty'}, status=400)
+            
+            total_amount = sum(item.subtotal for item in cart_items)
+            
+            # Book the pickup slot first; a full kitchen rolls everything back
+            reserve_slots(pickup_dt.date(), pickup_dt.time(), partner_demand(cart_items))
+            
+            order = Order.objects.create(
+                session_id=session_id,
+                customer_name=customer_name,
+                total_amount=total_amount,
+                tip_amount=tip_amount,
+                payment_method=payment_method,
+                pickup_date=pickup_dt.date(),
+                pickup_time=pickup_dt.time(),
+                status='pending'
             )
-            print(f"✅ Order item created: {order_item}")
+            
+            # Create order items from cart in one insert
+            order_items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    menu_item=cart_item.menu_item,
+                    quantity=cart_item.quantity,
+                    price_at_purchase=cart_item.menu_item.price,
+                    food_partner=cart_item.menu_item.food_partner,
+                    item_name=cart_item.menu_item.name
+                ) for cart_item in cart_items
+            ])
+            
+            record_order_created(order, order_items)
+            publish_order_event('order.created', order, order_partners(order, order_items))
+            
+            # Clear the cart
+            CartItem.objects.filter(cart=cart).delete()
+            
+            response = JsonResponse({
+                'success': True,
+                'message': 'Order created successfully',
+                'order_id': order.id,
+                'order': {
+                    'id': order.id,
+                    'customer_name': order.customer_name,
+                    'total': str(order.total_amount + order.tip_amount),
+                    'status': order.status,
+                    'pickup_date': order.pickup_date.isoformat(),
+                    'pickup_time': order.pickup_time.isoformat(),
+                }
+            }, status=201)
+            
+            if idempotency_key:
+                remember_response(idempotency_key, fingerprint, response)
         
-        # Clear the cart
-        deleted_count, _ = cart_items.delete()
-        print(f"✅ Deleted {deleted_count} cart items")
+        forget_cart(session_id)
         
-        print("=" * 50)
-        print(f"ORDER #{order.id} CREATED SUCCESSFULLY")
-        print("=" * 50)
+        logger.info('Order created', extra={'order_id': order.id, 'lines': len(order_items)})
         
+        return response
+        
+    except SlotFull as e:
         return JsonResponse({
-            'success': True,
-            'message': 'Order created successfully',
-            'order_id': order.id,
-            'order': {
-                'id': order.id,
-                'customer_name': order.customer_name,
-                'total': str(order.total_amount + order.tip_amount),
-                'status': order.status,
-                'pickup_date': order.pickup_date.isoformat(),
-                'pickup_time': order.pickup_time.isoformat(),
-            }
-        }, status=201)
+            'error': str(e),
+            'field': 'pickup_time',
+            'food_partner': e.food_partner,
+        }, status=409)
+    except Exception as e:
+        logger.exception('Error in create_order')
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_http_methods(["GET"])
+def get_pickup_slots(request):
+    """Next pickup slots and whether each has room (?partner=... or ?session_id=)"""
+    try:
+        session_id = request.GET.get('session_id')
+        demand = cart_demand(session_id) if session_id else {}
+        partners = request.GET.getlist('partner') or list(demand)
+        if not partners:
+            return JsonResponse({'error': 'partner or a non-empty cart required'}, status=400)
         
+        try:
+            count = int(request.GET.get('count', 12))
+            start = request.GET.get('start')
+            start = datetime.fromisoformat(start) if start else None
+        except ValueError:
+            return JsonResponse({'error': 'Invalid count or start'}, status=400)
+        if count < 1:
+            return JsonResponse({'error': 'count must be positive'}, status=400)
+        
+        slots = slot_availability(partners, start, count, demand)
+        return JsonResponse({'slot_minutes': settings.PICKUP_SLOT_MINUTES, 'slots': slots})
     except Exception as e:
-        print(f"❌ ERROR in create_order: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error getting pickup slots')
         return JsonResponse({'error': str(e)}, status=500)
 
 def get_orders(request):
@@ -698,33 +826,26 @@ def get_orders(request):
         if not session_id:
             return JsonResponse({'orders': []})
         
-        orders = Order.objects.filter(session_id=session_id).order_by('-created_at')
+        fields, item_fields = order_fields(request.GET, include_partner=False)
+        compact = is_compact(request.GET)
         
-        orders_data = []
-        for order in orders:
-            items_data = [{
-                'name': item.menu_item.name,
-                'quantity': item.quantity,
-                'price': str(item.price_at_purchase),
-                'subtotal': str(item.subtotal)
-            } for item in order.items.all()]
-            
-            orders_data.append({
-                'id': order.id,
-                'total': str(order.total_amount + order.tip_amount),
-                'tip': str(order.tip_amount),
-                'payment_method': order.payment_method,
-                'pickup_date': order.pickup_date.isoformat(),
-                'pickup_time': order.pickup_time.isoformat(),
-                'status': order.status,
-                'created_at': order.created_at.isoformat(),
-                'customer_name': order.customer_name or f'Guest #{order.session_id[:8]}',  # ✅ This line
-                'items': items_data
-            })
-        
-        return JsonResponse({'orders': orders_data})
+        orders, page_info = list_orders(
+            order_queryset(fields=fields, item_fields=item_fields).filter(session_id=session_id),
+            request.GET
+        )
+        orders_data = [
+            serialize_order(order, include_partner=False, guest_label='Guest',
+                            fields=fields, item_fields=item_fields)
+            for order in orders
+        ]
+        
+        if compact:
+            return JsonResponse({**compact_orders(orders_data, fields, item_fields), **page_info})
+        return JsonResponse({'orders': orders_data, **page_info})
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        print(f"Error getting orders: {str(e)}")
+        logger.exception('Error getting orders')
         return JsonResponse({'error': str(e)}, status=500)
 
 # ==================== FAVORITE VIEWS ====================
@@ -758,7 +879,7 @@ def add_favorite(request):
             'favorite_id': favorite.id
         })
     except Exception as e:
-        print(f"Error adding favorite: {str(e)}")
+        logger.exception('Error adding favorite')
         return JsonResponse({'error': str(e)}, status=500)
 
 @require_http_methods(["DELETE"])
@@ -786,7 +907,7 @@ def remove_favorite(request):
             'message': 'Removed from favorites'
         })
     except Exception as e:
-        print(f"Error removing favorite: {str(e)}")
+        logger.exception('Error removing favorite')
         return JsonResponse({'error': str(e)}, status=500)
 
 def get_favorites(request):
@@ -816,7 +937,7 @@ def get_favorites(request):
         
         return JsonResponse({'favorites': favorites_data})
     except Exception as e:
-        print(f"Error getting favorites: {str(e)}")
+        logger.exception('Error getting favorites')
         return JsonResponse({'error': str(e)}, status=500)
 
 def get_favorite_ids(request):
@@ -834,86 +955,85 @@ def get_favorite_ids(request):
         
         return JsonResponse({'favorite_ids': favorite_ids})
     except Exception as e:
-        print(f"Error getting favorite IDs: {str(e)}")
+        logger.exception('Error getting favorite IDs')
         return JsonResponse({'error': str(e)}, status=500)
 
 # ==================== FOOD PARTNER VIEWS ====================
 
 def get_food_partners(request):
-    """Get all active food partners with their menu items"""
+    """Get all active food partners with their menu items (cached until the menu changes)"""
     try:
-        partners = MenuItem.objects.filter(
-            available=True
-        ).values('food_partner').distinct().exclude(food_partner='')
-        
-        partners_data = []
-        for partner in partners:
-            partner_name = partner['food_partner']
-            items = MenuItem.objects.filter(
-                food_partner=partner_name,
+        def build():
+            # One query: item counts grouped by partner, with the first item's
+            # image and the Food_Partners metadata pulled in as subqueries
+            first_image = MenuItem.objects.filter(
+                food_partner=OuterRef('food_partner'),
                 available=True
-            )
-            partner_image = items.first().image_url if items.exists() else ''
+            ).order_by('id').values('image_url')[:1]
+            store = Food_Partners.objects.filter(store=OuterRef('food_partner'))
             
-            partners_data.append({
-                'name': partner_name,
-                'image_url': partner_image,
-                'item_count': items.count()
-            })
-        
-        return JsonResponse({'partners': partners_data})
+            partners = MenuItem.objects.filter(
+                available=True
+            ).exclude(food_partner='').values('food_partner').annotate(
+                item_count=Count('id'),
+                image_url=Subquery(first_image),
+                description=Subquery(store.values('description')[:1]),
+                logo_url=Subquery(store.values('logo_url')[:1]),
+                banner_url=Subquery(store.values('banner_url')[:1]),
+                # Partners without a Food_Partners row count as active
+                is_active=Coalesce(Subquery(store.values('is_active')[:1]), Value(True)),
+            ).filter(is_active=True).order_by('food_partner')
+            
+            return {'partners': [{
+                'name': partner['food_partner'],
+                'image_url': partner['image_url'] or '',
+                'item_count': partner['item_count'],
+                'description': partner['description'] or '',
+                'logo_url': partner['logo_url'] or '',
+                'banner_url': partner['banner_url'] or '',
+            } for partner in partners]}
+        
+        return cached_menu_response(request, 'partners', build)
     except Exception as e:
-        print(f"Error getting food partners: {str(e)}")
+        logger.exception('Error getting food partners')
         return JsonResponse({'error': str(e)}, status=500)
 
 
 def get_partner_menu_items(request, partner_name):
-    """Get all menu items for a specific food partner"""
+    """Get all menu items for a specific food partner (cached until the menu changes)"""
     try:
         # Decode URL-encoded partner name
         decoded_partner_name = unquote(partner_name)
+        fields = parse_fields(request.GET.get('fields'), MENU_ITEM_FIELDS)
+        compact = is_compact(request.GET)
         
-        print(f"=" * 50)
-        print(f"GET PARTNER MENU REQUEST")
-        print(f"Raw partner_name: {partner_name}")
-        print(f"Decoded partner_name: {decoded_partner_name}")
-        print(f"=" * 50)
-        
-        # Changed from filter(food_partner=..., available=True)
-        items = MenuItem.objects.filter(
-            food_partner=decoded_partner_name
-        )
-        
-        print(f"Found {items.count()} items for partner: {decoded_partner_name}")
-        
-        # If no items found, try to find what partners exist
-        if items.count() == 0:
-            all_partners = MenuItem.objects.values_list('food_partner', flat=True).distinct()
-            print(f"Available partners in database: {list(all_partners)}")
-        
-        data = [{
-            'id': item.id,
-            'name': item.name,
-            'description': item.description,
-            'price': str(item.price),
-            'image_url': item.image_url,
-            'category': item.category,
-            'food_partner': item.food_partner,
-            'available': item.available,  # Added this
-        } for item in items]
-        
-        print(f"Returning {len(data)} items")
-        print(f"=" * 50)
+        def build():
+            # Changed from filter(food_partner=..., available=True)
+            data = menu_item_rows(
+                MenuItem.objects.filter(food_partner=decoded_partner_name), fields
+            )
+            
+            logger.debug('Found %d items for partner %r', len(data), decoded_partner_name,
+                         extra={'view': 'get_partner_menu_items'})
+            
+            # If no items found, list what partners exist (debug builds only)
+            if not data and logger.isEnabledFor(logging.DEBUG):
+                all_partners = MenuItem.objects.values_list('food_partner', flat=True).distinct()
+                logger.debug('Available partners: %s', list(all_partners),
+                             extra={'view': 'get_partner_menu_items'})
+            
+            return {
+                'partner': decoded_partner_name,
+                **menu_items_payload(data, fields, compact),
+                'count': len(data)
+            }
         
-        return JsonResponse({
-            'partner': decoded_partner_name,
-            'items': data,
-            'count': len(data)
-        })
+        key = f'partner:{decoded_partner_name}:{",".join(fields)}:{compact}'
+        return cached_menu_response(request, key, build)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        print(f"Error getting partner menu items: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error getting partner menu items')
         return JsonResponse({'error': str(e)}, status=500)
     
     # ==================== ADMIN ORDER VIEWS ====================
@@ -928,53 +1048,36 @@ def get_partner_orders(request):
         if not partner_name:
             return JsonResponse({'error': 'Partner name required'}, status=400)
         
-        # Get all orders that have items from this partner
-        orders_with_partner_items = Order.objects.filter(
-            items__menu_item__food_partner=partner_name
-        ).distinct().order_by('-created_at')
-        
-        orders_data = []
-        for order in orders_with_partner_items:
-            # Only get items from this specific partner
-            partner_items = OrderItem.objects.filter(
-                order=order,
-                menu_item__food_partner=partner_name
+        # Delta sync: only orders changed (and ids deleted) since the cursor
+        if wants_changes(request.GET):
+            orders, deleted, page_info = order_changes(
+                order_queryset(partner_name), request.GET, partner_name
             )
-            
-            items_data = [{
-                'name': item.menu_item.name,
-                'quantity': item.quantity,
-                'price': str(item.price_at_purchase),
-                'subtotal': str(item.subtotal),
-                'food_partner': item.menu_item.food_partner
-            } for item in partner_items]
-            
-            # Calculate partner-specific total
-            partner_total = sum(item.subtotal for item in partner_items)
-            
-            orders_data.append({
-                'id': order.id,
-                'total': str(partner_total),
-                'tip': str(order.tip_amount),
-                'payment_method': order.payment_method,
-                'pickup_date': order.pickup_date.isoformat(),
-                'pickup_time': order.pickup_time.isoformat(),
-                'status': order.status,
-                'created_at': order.created_at.isoformat(),
-                'customer_name': order.customer_name if order.customer_name else f'Customer #{order.session_id[:8]}',  # FIXED
-                'items': items_data
+            orders_data = [serialize_partner_order(order) for order in orders]
+            return JsonResponse({
+                'partner': partner_name,
+                'orders': orders_data,
+                'deleted': deleted,
+                'count': len(orders_data),
+                **page_info
             })
         
+        # Get all orders that have items from this partner, with only
+        # that partner's lines attached
+        orders, page_info = list_orders(order_queryset(partner_name), request.GET)
+        orders_data = [serialize_partner_order(order) for order in orders]
+        
         return JsonResponse({
             'partner': partner_name,
             'orders': orders_data,
-            'count': len(orders_data)
+            'count': len(orders_data),
+            **page_info
         })
         
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        print(f"Error getting partner orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error getting partner orders')
         return JsonResponse({'error': str(e)}, status=500)
 
 
@@ -990,12 +1093,18 @@ def update_partner_order_status(request, order_id):
         if new_status not in valid_statuses:
             return JsonResponse({'error': 'Invalid status'}, status=400)
         
-        # Get and update order
-        order = Order.objects.get(id=order_id)
-        order.status = new_status
-        order.save()
+        # Get and update order, moving its rollup totals with it
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(id=order_id)
+            old_status = order.status
+            order.status = new_status
+            order.save()
+            record_status_change(order, old_status)
+            record_slot_status_change(order, old_status)
+            if old_status != new_status:
+                publish_order_event('order.status_changed', order, order_partners(order), old_status)
         
-        print(f"✅ Order #{order_id} status updated to: {new_status}")
+        logger.info('Order status updated', extra={'order_id': order.id, 'old_status': old_status, 'status': new_status})
         
         return JsonResponse({
             'success': True,
@@ -1006,7 +1115,7 @@ def update_partner_order_status(request, order_id):
     except Order.DoesNotExist:
         return JsonResponse({'error': 'Order not found'}, status=404)
     except Exception as e:
-        print(f"Error updating order: {str(e)}")
+        logger.exception('Error updating order')
         return JsonResponse({'error': str(e)}, status=500)
     
     # ==================== ADMIN ORDER VIEWS ====================
@@ -1014,43 +1123,37 @@ def update_partner_order_status(request, order_id):
 def get_all_orders_admin(request):
     """Get all orders for admin dashboard"""
     try:
-        # Get all orders, newest first
-        orders = Order.objects.all().order_by('-created_at')
-        
-        orders_data = []
-        for order in orders:
-            # Get order items
-            order_items = OrderItem.objects.filter(order=order)
-            items_data = [{
-                'name': item.menu_item.name,
-                'quantity': item.quantity,
-                'price': str(item.price_at_purchase),
-                'subtotal': str(item.subtotal),
-                'food_partner': item.menu_item.food_partner
-            } for item in order_items]
-            
-            orders_data.append({
-                'id': order.id,
-                'total': str(order.total_amount + order.tip_amount),
-                'tip': str(order.tip_amount),
-                'payment_method': order.payment_method,
-                'pickup_date': order.pickup_date.isoformat(),
-                'pickup_time': order.pickup_time.isoformat(),
-                'status': order.status,
-                'created_at': order.created_at.isoformat(),
-                'customer_name': order.customer_name if order.customer_name else f'Customer #{order.session_id[:8]}',
-                'items': items_data
-            })
+        fields, item_fields = order_fields(request.GET)
+        compact = is_compact(request.GET)
         
-        return JsonResponse({'orders': orders_data})
+        # Get all orders, newest first
+        orders, page_info = list_orders(order_queryset(fields=fields, item_fields=item_fields), request.GET)
+        orders_data = [serialize_order(order, fields=fields, item_fields=item_fields) for order in orders]
+        
+        if compact:
+            return JsonResponse({**compact_orders(orders_data, fields, item_fields), **page_info})
+        return JsonResponse({'orders': orders_data, **page_info})
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        print(f"Error getting admin orders: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error getting admin orders')
         return JsonResponse({'error': str(e)}, status=500)
 
 
 
+@require_http_methods(["GET"])
+def get_admin_stats(request):
+    """Get aggregated dashboard stats (admin, or one partner with ?partner=)"""
+    try:
+        partner_name = request.GET.get('partner', '')
+        return JsonResponse(dashboard_stats(request.GET, partner_name))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.exception('Error getting admin stats')
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @require_http_methods(["PATCH"])
 def update_order_status(request, order_id):
     """Update order status (for API compatibility - but admin panel is now read-only)"""
@@ -1063,12 +1166,18 @@ def update_order_status(request, order_id):
         if new_status not in valid_statuses:
             return JsonResponse({'error': 'Invalid status'}, status=400)
         
-        # Get and update order
-        order = Order.objects.get(id=order_id)
-        order.status = new_status
-        order.save()
+        # Get and update order, moving its rollup totals with it
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(id=order_id)
+            old_status = order.status
+            order.status = new_status
+            order.save()
+            record_status_change(order, old_status)
+            record_slot_status_change(order, old_status)
+            if old_status != new_status:
+                publish_order_event('order.status_changed', order, order_partners(order), old_status)
         
-        print(f"✅ Order #{order_id} status updated to: {new_status}")
+        logger.info('Order status updated', extra={'order_id': order.id, 'old_status': old_status, 'status': new_status})
         
         return JsonResponse({
             'success': True,
@@ -1079,23 +1188,53 @@ def update_order_status(request, order_id):
     except Order.DoesNotExist:
         return JsonResponse({'error': 'Order not found'}, status=404)
     except Exception as e:
-        print(f"Error updating order: {str(e)}")
+        logger.exception('Error updating order')
         return JsonResponse({'error': str(e)}, status=500)
-    
+
+
+# ==================== ORDER EVENTS ====================
+
+@require_http_methods(["GET"])
+async def order_events(request):
+    """Stream order events (SSE), filtered by ?partner= or ?session_id=
+
+    The unfiltered stream of every order is for logged-in admins only.
+    Under WSGI the stream would hold a worker for good, so it is refused
+    with a 503 and the frontend falls back to polling.
+    """
+    partner = request.GET.get('partner')
+    session_id = request.GET.get('session_id')
+    if not partner and not session_id and not await can_stream_all(await request.auser()):
+        return JsonResponse({'error': 'Admin login required for the stream of all orders'}, status=403)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Order events need the ASGI server; poll the order endpoints instead'}, status=503)
+    matches = event_filter(partner, session_id)
+    response = StreamingHttpResponse(stream_events(matches), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class CancelOrderView(View):
     def post(self, request, order_id):
         try:
-            # Fetch the order first
-            order = Order.objects.get(id=order_id)
-            
-            # Check cancellation window
-            if timezone.now() - order.created_at > timedelta(minutes=1):
-                return JsonResponse({'error': 'Cancellation window has expired'}, status=400)
+            with transaction.atomic():
+                # Fetch the order first
+                order = Order.objects.select_for_update().get(id=order_id)
+                
+                # Check cancellation window
+                if timezone.now() - order.created_at > timedelta(minutes=1):
+                    return JsonResponse({'error': 'Cancellation window has expired'}, status=400)
 
-            # Cancel the order
-            order.status = 'cancelled'
-            order.save()
+                # Cancel the order
+                old_status = order.status
+                order.status = 'cancelled'
+                order.save()
+                record_status_change(order, old_status)
+                record_slot_status_change(order, old_status)
+                if old_status != order.status:
+                    publish_order_event('order.status_changed', order, order_partners(order), old_status)
 
             return JsonResponse({'success': True, 'message': 'Order cancelled successfully'})
 
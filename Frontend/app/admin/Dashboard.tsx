@@ -44,7 +44,7 @@ type Stats = {
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'https://clicktoeat-pw67.onrender.com';
 
-import { getAllOrders } from '../services/api';
+import { getAdminStats, subscribeToOrderEvents } from '../services/api';
 
 export default function Dashboard() {
   const [stats, setStats] = useState<Stats>({
@@ -75,32 +75,29 @@ export default function Dashboard() {
     }
     
     fetchDashboardData();
-    const interval = setInterval(fetchDashboardData, 30000);
-    return () => clearInterval(interval);
+    // Refresh the (cheap) stats when an order is placed or changes status,
+    // polling every 30 s while the event stream is unavailable
+    return subscribeToOrderEvents({}, fetchDashboardData, fetchDashboardData);
   }, []);
 
   const fetchDashboardData = async () => {
     try {
       console.log('📊 Fetching dashboard data...');
-      const data = await getAllOrders();
-      const orders = data.orders || [];
+      const data = await getAdminStats();
+      const counts = data.status_counts || {};
       
-      console.log(`✅ Loaded ${orders.length} orders`);
+      console.log(`✅ Loaded stats for ${data.total_orders} orders`);
       
-      const pending = orders.filter((o: any) => o.status === 'pending').length;
-      const confirmed = orders.filter((o: any) => o.status === 'confirmed').length;
-      const preparing = orders.filter((o: any) => o.status === 'preparing').length;
-      const ready = orders.filter((o: any) => o.status === 'ready').length;
-      const completed = orders.filter((o: any) => o.status === 'completed').length;
-      const cancelled = orders.filter((o: any) => o.status === 'cancelled').length;
+      const pending = counts.pending || 0;
+      const confirmed = counts.confirmed || 0;
+      const preparing = counts.preparing || 0;
+      const ready = counts.ready || 0;
+      const completed = counts.completed || 0;
+      const cancelled = counts.cancelled || 0;
       
-      const salesByDay = calculateSalesByDay(orders);
-      
-      const today = new Date().toISOString().split('T')[0];
-      const todaysOrders = orders.filter((o: any) => o.pickup_date === today);
-      const salesToday = todaysOrders.reduce((sum: number, o: any) => sum + parseFloat(o.total), 0);
-      
-      const topProduct = findTopProduct(orders);
+      const salesByDay = calculateSalesByDay(data.sales_by_day || []);
+      const salesToday = parseFloat(data.sales_today);
+      const topProduct = data.top_product || "No orders yet";
       
       const ordersByStatus = [
         { name: "Pending", value: pending },
@@ -118,7 +115,7 @@ export default function Dashboard() {
         ready,
         completed,
         cancelled,
-        totalOrders: orders.length,
+        totalOrders: data.total_orders,
         salesToday,
         topProduct,
         salesByDay,
@@ -134,16 +131,15 @@ export default function Dashboard() {
     }
   };
 
-  const calculateSalesByDay = (orders: any[]): SalesByDay[] => {
+  const calculateSalesByDay = (salesRows: { date: string; sales: string }[]): SalesByDay[] => {
     const days = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'];
     const salesMap: { [key: string]: number } = {};
     
     days.forEach(day => salesMap[day] = 0);
     
-    orders.forEach((order: any) => {
-      const orderDate = new Date(order.created_at);
-      const dayName = days[orderDate.getDay()];
-      salesMap[dayName] += parseFloat(order.total);
+    salesRows.forEach((row) => {
+      const dayName = days[new Date(`${row.date}T00:00:00`).getDay()];
+      salesMap[dayName] += parseFloat(row.sales);
     });
     
     return days.map(day => ({
@@ -152,28 +148,6 @@ export default function Dashboard() {
     }));
   };
 
-  const findTopProduct = (orders: any[]): string => {
-    const productCount: { [key: string]: number } = {};
-    
-    orders.forEach((order: any) => {
-      order.items.forEach((item: any) => {
-        productCount[item.name] = (productCount[item.name] || 0) + item.quantity;
-      });
-    });
-    
-    let topProduct = "No orders yet";
-    let maxCount = 0;
-    
-    Object.entries(productCount).forEach(([name, count]: [string, any]) => {
-      if (count > maxCount) {
-        maxCount = count;
-        topProduct = name;
-      }
-    });
-    
-    return topProduct;
-  };
-
   if (loading) {
     return (
       <div className="flex items-center justify-center min-h-screen w-full">
@@ -27,7 +27,7 @@ type Order = {
 const STATUS_OPTIONS = ["pending", "confirmed", "preparing", "ready", "completed", "cancelled"];
 
 // Mock API function - replace with your actual import
-import { getAllOrders } from '../../services/api';
+import { getAllOrders, subscribeToOrderEvents } from '../../services/api';
 
 export default function AdminOrdersPage() {
   const [orders, setOrders] = useState<Order[]>([]);
@@ -37,9 +37,17 @@ export default function AdminOrdersPage() {
   // Fetch Data on Load
   useEffect(() => {
     fetchData();
-    // Auto-refresh every 30 seconds
-    const interval = setInterval(fetchData, 30000);
-    return () => clearInterval(interval);
+    // Status changes are pushed by the server; only new orders need a fetch.
+    // While the event stream is unavailable, poll every 30 s instead.
+    return subscribeToOrderEvents({}, (event) => {
+      if (event.type === 'order.status_changed') {
+        setOrders((prev) =>
+          prev.map((order) => (order.id === event.order_id ? { ...order, status: event.status } : order))
+        );
+      } else {
+        fetchData();
+      }
+    }, fetchData);
   }, []);
 
   const fetchData = async () => {
@@ -2,6 +2,7 @@
 
 import { useState, useEffect, Suspense } from "react";
 import { useSearchParams } from "next/navigation";
+import { subscribeToOrderEvents } from "../../services/api";
 
 type OrderStatus =
   | "pending"
@@ -76,6 +77,20 @@ function OwnerContent() {
     }
   }, [searchParams]);
 
+  // Live updates for this partner's orders
+  useEffect(() => {
+    if (!userInfo?.food_partner) return;
+    return subscribeToOrderEvents({ partner: userInfo.food_partner }, (event) => {
+      if (event.type === 'order.status_changed') {
+        setOrders((prev) =>
+          prev.map((order) => (order.id === event.order_id ? { ...order, status: event.status } : order))
+        );
+      } else {
+        loadOrders(userInfo.food_partner);
+      }
+    });
+  }, [userInfo]);
+
   const loadOrders = async (foodPartner: string, attempt: number = 1) => {
     try {
       console.log(`🔍 Loading orders for: ${foodPartner} (Attempt ${attempt})`);
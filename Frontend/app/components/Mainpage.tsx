@@ -2,8 +2,8 @@
 
 import Image from "next/image";
 import Link from "next/link";
-import { useState, useEffect } from "react";
-import { getMenuItems, getFavoriteIds, addFavorite, removeFavorite } from "../services/api";
+import { useState, useEffect, useRef } from "react";
+import { getMenuItems, searchMenu, getFavoriteIds, addFavorite, removeFavorite } from "../services/api";
 
 type MenuItem = {
   id: number;
@@ -14,10 +14,18 @@ type MenuItem = {
   category: string;
 };
 
+// Search results are fetched a page at a time, more on request
+const SEARCH_PAGE_SIZE = 40;
+
 export default function Mainpage() {
   const [menuItems, setMenuItems] = useState<MenuItem[]>([]);
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState("");
+  const [searchResults, setSearchResults] = useState<MenuItem[] | null>(null);
+  const [searchNextOffset, setSearchNextOffset] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // The query the shown results belong to, so a late page can be dropped
+  const searchQuery = useRef("");
   const [activeCategory, setActiveCategory] = useState("All");
   const [favorites, setFavorites] = useState<number[]>([]);
   const [currentPromo, setCurrentPromo] = useState(0);
@@ -48,6 +56,32 @@ export default function Mainpage() {
     loadFavorites();
   }, []);
 
+  // Search on the server (ranked, typo-tolerant) once typing pauses
+  useEffect(() => {
+    // Drop the previous query's results so the local filter shows meanwhile
+    setSearchResults(null);
+    setSearchNextOffset(null);
+    const query = search.trim();
+    searchQuery.current = query;
+    if (!query) return;
+    let stale = false;
+    const timer = setTimeout(async () => {
+      try {
+        // First page only; "Show more results" fetches the rest
+        const response = await searchMenu(query, { available: 'all', limit: SEARCH_PAGE_SIZE });
+        if (stale) return;
+        setSearchResults(response.items);
+        setSearchNextOffset(response.next_offset);
+      } catch (error) {
+        console.error('Error searching menu:', error);
+      }
+    }, 250);
+    return () => {
+      stale = true;
+      clearTimeout(timer);
+    };
+  }, [search]);
+
   // Auto-rotate promos
   useEffect(() => {
     const interval = setInterval(() => {
@@ -70,6 +104,22 @@ export default function Mainpage() {
     }
   };
 
+  const loadMoreResults = async () => {
+    const query = searchQuery.current;
+    if (searchNextOffset === null || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const response = await searchMenu(query, { available: 'all', limit: SEARCH_PAGE_SIZE, offset: searchNextOffset });
+      if (searchQuery.current !== query) return;
+      setSearchResults((items) => [...(items ?? []), ...response.items]);
+      setSearchNextOffset(response.next_offset);
+    } catch (error) {
+      console.error('Error loading more search results:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const loadFavorites = async () => {
     try {
       const response = await getFavoriteIds();
@@ -95,10 +145,12 @@ export default function Mainpage() {
     }
   };
 
-  const filteredFoods = menuItems.filter((food) => {
-    const matchesSearch = food.name.toLowerCase().includes(search.toLowerCase());
-    const matchesCategory = activeCategory === "All" || food.category === activeCategory;
-    return matchesSearch && matchesCategory;
+  // Until the server answers, narrow the loaded menu by name
+  const searchedFoods = searchResults ?? menuItems.filter((food) =>
+    food.name.toLowerCase().includes(search.trim().toLowerCase())
+  );
+  const filteredFoods = searchedFoods.filter((food) => {
+    return activeCategory === "All" || food.category === activeCategory;
   });
 
   const categories = ["All", ...Array.from(new Set(menuItems.map(item => item.category)))];
@@ -234,6 +286,18 @@ export default function Mainpage() {
             )}
           </div>
 
+          {searchResults && searchNextOffset !== null && (
+            <div className="text-center mt-8">
+              <button
+                onClick={loadMoreResults}
+                disabled={loadingMore}
+                className="px-6 py-2.5 cursor-pointer rounded-full transition-all duration-200 font-medium bg-gray-100 text-gray-700 hover:bg-gray-200 hover:shadow-md disabled:opacity-50 disabled:cursor-wait"
+              >
+                {loadingMore ? 'Loading...' : 'Show more results'}
+              </button>
+            </div>
+          )}
+
           {filteredFoods.length > 0 && (
             <div className="text-center mt-8 text-gray-600">
               Showing {filteredFoods.length} of {menuItems.length} items
@@ -1,10 +1,10 @@
 'use client'
 
 import Image from "next/image";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import Link from "next/link";
 import { useRouter } from "next/navigation";
-import { createOrder, getCart, checkAuth, cancelOrder } from "../../services/api";
+import { createOrder, getCart, checkAuth, cancelOrder, newIdempotencyKey } from "../../services/api";
 import { useToast } from "../../components/Toast";
 
 type PaymentMethod = {
@@ -45,6 +45,7 @@ export default function CheckoutPage() {
   const [orderPlaced, setOrderPlaced] = useState(false);
   const [orderId, setOrderId] = useState<string | null>(null);
   const [cancelTimeLeft, setCancelTimeLeft] = useState(60);
+  const idempotencyKey = useRef(newIdempotencyKey());
 
   useEffect(() => {
     const now = new Date();
@@ -146,7 +147,7 @@ export default function CheckoutPage() {
         tip: tip,
         pickup_time: pickupTime,
         customer_name: customerName
-      });
+      }, idempotencyKey.current);
 
       if (response.success) {
         setOrderId(response.order_id);
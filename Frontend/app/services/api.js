@@ -264,19 +264,53 @@ export async function removeFromCart(itemId) {
   return response.json();
 }
 
-// ==================== ORDER FUNCTIONS ====================
-
-// ==================== ORDER FUNCTIONS ====================
-
-export async function createOrder(orderData) {
-  const response = await apiFetch('/api/orders/create/', {
+// Apply several cart changes in one request, e.g.
+// [{ op: 'add', menu_item_id: 3, quantity: 2 }, { op: 'set', menu_item_id: 5, quantity: 1 }, { op: 'remove', menu_item_id: 7 }]
+// Resolves to the final cart, shaped like getCart()
+export async function batchUpdateCart(operations) {
+  const response = await apiFetch('/api/cart/batch/', {
     method: 'POST',
     body: JSON.stringify({
-      ...orderData,
-      session_id: getSessionId()
+      session_id: getSessionId(),
+      operations
     })
   });
   
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.error || 'Failed to update cart');
+  }
+  return response.json();
+}
+
+// ==================== ORDER FUNCTIONS ====================
+
+// ==================== ORDER FUNCTIONS ====================
+
+// One key per checkout attempt; retries reuse it so the server replays the
+// first response instead of placing a duplicate order
+export function newIdempotencyKey() {
+  return 'order_' + Math.random().toString(36).substr(2, 9) + Date.now();
+}
+
+export async function createOrder(orderData, idempotencyKey = newIdempotencyKey(), retries = 2) {
+  let response;
+  for (let attempt = 0; ; attempt++) {
+    try {
+      response = await apiFetch('/api/orders/create/', {
+        method: 'POST',
+        headers: { 'Idempotency-Key': idempotencyKey },
+        body: JSON.stringify({
+          ...orderData,
+          session_id: getSessionId()
+        })
+      });
+      if (response.status < 500 || attempt >= retries) break;
+    } catch (err) {
+      if (attempt >= retries) throw err;
+    }
+  }
+  
   if (!response.ok) {
     const error = await response.json();
     throw new Error(error.error || 'Failed to create order');
@@ -284,6 +318,45 @@ export async function createOrder(orderData) {
   return response.json();
 }
 
+// The server sends a keepalive event every 15 s; a stream quiet for longer
+// than ORDER_EVENTS_SILENCE_MS is treated as down
+const ORDER_EVENTS_SILENCE_MS = 35000;
+const ORDER_POLL_INTERVAL_MS = 30000;
+
+// Live order updates over Server-Sent Events. params narrows the stream
+// ({ partner } or { session_id }); onEvent gets order.created,
+// order.status_changed and resync (refetch) events. Returns a close function.
+//
+// The stream only works where the backend runs under ASGI with one process
+// or a shared broker. Elsewhere (e.g. serverless WSGI) it errors or stays
+// silent, so onPoll, when given, is called every 30 s whenever the stream
+// isn't open or hasn't been heard from lately.
+export function subscribeToOrderEvents(params = {}, onEvent, onPoll) {
+  const query = new URLSearchParams(params).toString();
+  const source = new EventSource(
+    `${API_BASE_URL}/api/orders/events/${query ? `?${query}` : ''}`,
+    { withCredentials: true }
+  );
+  let lastHeard = 0;
+  source.addEventListener('keepalive', () => { lastHeard = Date.now(); });
+  ['order.created', 'order.status_changed', 'resync'].forEach((type) => {
+    source.addEventListener(type, (e) => {
+      lastHeard = Date.now();
+      onEvent(JSON.parse(e.data));
+    });
+  });
+
+  const poll = onPoll && setInterval(() => {
+    if (source.readyState !== EventSource.OPEN || Date.now() - lastHeard > ORDER_EVENTS_SILENCE_MS) {
+      onPoll();
+    }
+  }, ORDER_POLL_INTERVAL_MS);
+  return () => {
+    source.close();
+    if (poll) clearInterval(poll);
+  };
+}
+
 export async function cancelOrderAdmin(orderId) {
   const response = await apiFetch(`/api/orders/cancel/${orderId}/`, {
     method: 'POST'
@@ -385,6 +458,18 @@ export async function getMenuItems() {
   return response.json();
 }
 
+// Ranked, typo-tolerant search. params: { available: 'true'|'false'|'all',
+// partner, category, limit, offset }; returns { items, next_offset }.
+export async function searchMenu(query, params = {}) {
+  const search = new URLSearchParams({ q: query, ...params }).toString();
+  const response = await apiFetch(`/api/menu/search/?${search}`);
+  
+  if (!response.ok) {
+    throw new Error('Failed to search menu');
+  }
+  return response.json();
+}
+
 export async function getMenuItemById(id) {
   const response = await apiFetch(`/api/menu/${id}/`);
   
@@ -474,6 +559,14 @@ export async function getAllOrders() {
   return response.json();
 }
 
+export async function getAdminStats(params = {}) {
+  const query = new URLSearchParams(params).toString();
+  const response = await apiFetch(`/api/admin/stats/${query ? `?${query}` : ''}`);
+  
+  if (!response.ok) throw new Error('Failed to fetch dashboard stats');
+  return response.json();
+}
+
 export async function updateOrderStatus(orderId, status) {
   const response = await apiFetch(`/api/admin/orders/${orderId}/status/`, {
     method: 'PATCH',